@@ -4,15 +4,37 @@ Main graphical interface for the application
 """
 
 import tkinter as tk
+import tkinter.font as tkfont
 from tkinter import ttk, scrolledtext, filedialog, messagebox
 import threading
+import queue
+import time
+from collections import deque, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+import math
 import cv2
 import numpy as np
 from PIL import Image, ImageTk
-from datetime import datetime
-import base64
 import os
 
+DEBUG = False  # per-message tracing; formatting + stdout locking is costly at 30 fps
+
+
+# Compact record for shared-file announcements; lighter than a dict per file
+FileEntry = namedtuple('FileEntry', 'filename size uploader')
+
+_ts_cache = [0, '']  # (whole second, formatted HH:MM:SS) of the last timestamp
+
+
+def _hms():
+    """Current time as HH:MM:SS, reformatted at most once per second"""
+    s = int(time.time())
+    if s != _ts_cache[0]:
+        _ts_cache[0] = s
+        _ts_cache[1] = time.strftime('%H:%M:%S', time.localtime(s))
+    return _ts_cache[1]
+
 from client_network import ClientNetwork
 from client_media import MediaHandler
 
@@ -29,6 +51,11 @@ class LANCommClientGUI:
         self._brand_blue_hover = '#0E71EB'
         self._danger_red = '#E74C3C'
         self._danger_red_hover = '#C0392B'
+
+        # Fonts used on per-frame canvas items; Font objects are looked up once
+        # instead of Tk re-parsing a ('Segoe UI', ...) tuple on every draw
+        self._font_body = tkfont.Font(family='Segoe UI', size=14)
+        self._font_header = tkfont.Font(family='Segoe UI', size=14, weight='bold')
         
         # Network and media
         self.network = ClientNetwork(self)
@@ -36,14 +63,66 @@ class LANCommClientGUI:
         
         # State
         self.username = None
-        self.received_videos = {}
-        self.video_lock = threading.Lock()
-        self.local_video_frame = None
+        self._username_norm = ''  # stripped+lowered username, set on connect
+        # Remote frames live in an immutable snapshot dict swapped atomically
+        # under the GIL: the receive path builds a new dict and rebinds it, so
+        # the render worker reads without taking a lock
+        self._video_snapshot = {}  # {user: (seq, frame)}
+        self._local_video = None  # (seq, frame) for own camera, or None
+        self._resize_pool = {}  # {(w, h): BGR ndarray} reused as cv2.resize dst
+        self._rgba_pool = {}  # {(w, h): RGBA ndarray} reused as cv2.cvtColor dst
+        self._canvas_bufs = [None, None]  # double-buffered RGBA composition buffers
+        self._buf_index = 0
+        self._compose_signature = ()  # (canvas size, layout, per-user seqs) of last composite
+        self._video_photo = None  # sole PhotoImage ref for the video canvas
+        self._video_photo_size = 0  # square size the PhotoImage was allocated for
+        self._video_item = None  # persistent canvas item showing the composite
+        self._render_q = queue.Queue(maxsize=1)  # latest composed frame, worker -> Tk
+        self._canvas_size = (0, 0)  # video canvas dims, updated from <Configure>
+        self._layout_cache = {}  # {(n, canvas_w, canvas_h): grid geometry + tile coords}
+        self._dirty_video = True  # new frame / roster / geometry since last compose
+        self._dirty_screen = True  # screen share changed since last repaint
+        self._screen_ref = None  # keeps the painted PhotoImage alive
+        self._screen_items = None  # persistent (image, header rect, header text) item ids
+        self._last_presenter_text = None  # header text currently rasterized
+        # Screen frames are decoded off the network callback thread so a slow
+        # JPEG/PNG decode never stalls TCP receive
+        self._decode_pool = ThreadPoolExecutor(max_workers=1)
+        # Shared pool for network-bound UI actions (downloads etc.) instead of
+        # spawning a fresh thread per click
+        self._io_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix='netio')
+        # Reused by the (single) decode worker so each frame skips a BytesIO
+        # allocation; img.load() fully decodes before the next frame reuses it
+        self._screen_bio = BytesIO()
+        self._screen_display_size = None  # (w, h) the share area last laid out at
+        self._newest_screen_frame_id = -1  # newest frame id seen on the wire
+        # Chat messages are queued and flushed in one batch per ~frame so a
+        # burst costs one after() marshal and one scroll, not one each
+        self._chat_queue = deque()
+        self._chat_flush_scheduled = False
         self.screen_frame = None
         self.last_screen_frame = None  # Track last displayed frame to avoid redundant updates
         self.presenter_name = None
+        self.current_chat_target = None  # username for private chat, None for group
+        self._last_users = []  # roster currently shown in the listbox
+        self._resize_job = None  # pending after() id for right-section relayout
         self.available_files = {}
-        
+
+        # Inbound message dispatch: one dict lookup per message instead of
+        # walking an if/elif chain of string compares
+        self._msg_handlers = {
+            'welcome': self._on_welcome,
+            'user_joined': self._on_user_joined,
+            'user_left': self._on_user_left,
+            'chat': self._on_chat,
+            'private_chat': self._on_private_chat,
+            'presentation_started': self._on_presentation_started,
+            'presentation_stopped': self._on_presentation_stopped,
+            'screen_frame': self._on_screen_frame,
+            'file_available': self._on_file_available,
+            'file_data': self._on_file_data,
+        }
+
         # Setup GUI
         self.setup_styles()
         self.create_connection_screen()
@@ -88,13 +167,20 @@ class LANCommClientGUI:
         # place content with padding equal to radius so arcs have room
         canvas.create_window(radius, radius, anchor='nw', window=content)
 
+        last_dims = [None]
+
         def redraw(event=None):
             req_w = content.winfo_reqwidth() + (radius * 2)
             req_h = content.winfo_reqheight() + (radius * 2)
-            canvas.config(width=req_w, height=req_h)
             w = max(2, req_w)
             h = max(2, req_h)
             r = max(2, radius)
+            # <Configure> fires on focus/children changes too; skip the
+            # delete+recreate of arcs and rects when nothing actually resized
+            if (w, h, r) == last_dims[0]:
+                return
+            last_dims[0] = (w, h, r)
+            canvas.config(width=req_w, height=req_h)
             canvas.delete('bg')
             # corners
             canvas.create_arc(0, 0, 2*r, 2*r, start=90, extent=90, fill=panel_bg, outline=panel_bg, tags='bg')
@@ -127,7 +213,13 @@ class LANCommClientGUI:
         h = th + pady*2
         c.config(width=w, height=h)
 
+        last_color = [None]
+
         def draw(color):
+            # Hover can re-fire without a state change; repaint only on change
+            if color == last_color[0]:
+                return
+            last_color[0] = color
             c.delete('btn')
             r = radius
             # rounded rect
@@ -150,7 +242,18 @@ class LANCommClientGUI:
         try:
             img_path = os.path.join(os.path.dirname(__file__), 'Spectral_20Dark_20-_2050.jpg')
             from PIL import Image
-            self._bg_original = Image.open(img_path).convert('RGB')
+            self._bg_original = Image.open(img_path)
+            # libjpeg DCT shrink-on-load: decode at 1/2, 1/4 or 1/8 scale when the
+            # source is much larger than the screen, instead of full-res decode
+            self._bg_original.draft('RGB', (self.root.winfo_screenwidth(),
+                                            self.root.winfo_screenheight()))
+            self._bg_original = self._bg_original.convert('RGB')
+            # Pre-shrink a huge source once so per-event resizes touch fewer pixels
+            max_w = 2 * self.root.winfo_screenwidth()
+            if self._bg_original.width > max_w:
+                scale = max_w / self._bg_original.width
+                self._bg_original = self._bg_original.resize(
+                    (max_w, max(1, int(self._bg_original.height * scale))), Image.BILINEAR)
         except Exception:
             self._bg_original = None
             return
@@ -170,7 +273,8 @@ class LANCommClientGUI:
                 # cover behavior: scale by max ratio
                 scale = max(w / ow, h / oh)
                 nw, nh = max(1, int(ow * scale)), max(1, int(oh * scale))
-                img = self._bg_original.resize((nw, nh), Image.LANCZOS)
+                # BILINEAR is plenty for a decorative background and far cheaper
+                img = self._bg_original.resize((nw, nh), Image.BILINEAR)
                 # center crop to window
                 left = max(0, (nw - w) // 2)
                 top = max(0, (nh - h) // 2)
@@ -181,8 +285,17 @@ class LANCommClientGUI:
             except Exception:
                 pass
 
+        # Debounce: <Configure> fires dozens of times per second during a drag,
+        # so coalesce redraws instead of resizing per event
+        self._bg_after = None
+
+        def schedule_resize_bg(event=None):
+            if self._bg_after is not None:
+                self.root.after_cancel(self._bg_after)
+            self._bg_after = self.root.after(50, resize_bg)
+
         # Bind and perform initial draw
-        self._bg_bind_id = self.root.bind('<Configure>', lambda e: resize_bg())
+        self._bg_bind_id = self.root.bind('<Configure>', schedule_resize_bg)
         self.root.after(0, resize_bg)
     
     def setup_styles(self):
@@ -297,6 +410,13 @@ class LANCommClientGUI:
         self.video_canvas = tk.Canvas(parent, bg='#1C1C1C', height=1,
                                      highlightthickness=0)
         self.video_canvas.pack(fill='both', expand=True, padx=8, pady=8)
+        # Track dims here so the render worker never has to call winfo_* off-thread
+        self.video_canvas.bind('<Configure>', self._on_video_canvas_resize)
+
+    def _on_video_canvas_resize(self, event):
+        """Record video canvas dims and flag a recompose"""
+        self._canvas_size = (event.width, event.height)
+        self._dirty_video = True
     
     def create_screen_panel(self, parent):
         """Create screen sharing panel"""
@@ -342,9 +462,22 @@ class LANCommClientGUI:
 
         self.chat_display = scrolledtext.ScrolledText(frame, height=1, bg='#1C1C1C',
                                                        fg='#FFFFFF', font=('Segoe UI', 14),
-                                                       wrap='word', state='disabled', relief='flat')
+                                                       wrap='word', relief='flat')
         self.chat_display.pack(fill='both', expand=True, padx=8, pady=8)
-        
+        # Stays 'normal' so inserts skip the enable/disable round-trips;
+        # user edits are swallowed instead (typing, clipboard paste and
+        # the X11 middle-click selection paste)
+        self.chat_display.bind('<Key>', lambda e: 'break')
+        self.chat_display.bind('<<Paste>>', lambda e: 'break')
+        self.chat_display.bind('<<PasteSelection>>', lambda e: 'break')
+        self.chat_display.bind('<Button-2>', lambda e: 'break')
+        # Static tags are configured once here; per-message handlers only add
+        # dynamic tags (file links, per-color system messages)
+        self.chat_display.tag_config('ts', foreground='#A1A1A1')
+        self.chat_display.tag_config('user', foreground='#2D8CFF', font=('Segoe UI', 14, 'bold'))
+        self._sys_color_tags = {}  # {color: tag name} for system-message colors
+
+
         input_frame = tk.Frame(frame, bg='#232323')
         input_frame.pack(fill='x', padx=8, pady=8)
         
@@ -392,6 +525,7 @@ class LANCommClientGUI:
             return
         
         self.username = username
+        self._username_norm = username.lower()  # identity for case-insensitive compares
         result = self.network.connect(server, username)
         
         if result == True or (isinstance(result, tuple) and result[0]):
@@ -410,137 +544,271 @@ class LANCommClientGUI:
             self.main_frame.pack(fill='both', expand=True)
             self.username_label.config(text=f"User: {self.username}")
             
-            # Start update loops
+            # Start render worker and the combined receive+display tick
+            threading.Thread(target=self._render_worker, daemon=True).start()
             self.update_video_display()
-            self.update_video_receive()
         else:
             error = result[1] if isinstance(result, tuple) else "Connection failed"
             self.status_label.config(text=error)
     
     def update_video_receive(self):
-        """Continuously receive video frames"""
-        if not self.network.running:
-            return
-        
+        """Drain received video frames into the snapshot (called from the tick)"""
         frames = self.media.receive_video_frames()
-        
-        with self.video_lock:
+
+        if frames:
+            new = dict(self._video_snapshot)
             for username, frame in frames.items():
-                self.received_videos[username] = frame
-        
-        self.root.after(10, self.update_video_receive)
+                old = new.get(username)
+                new[username] = ((old[0] + 1) if old else 1, frame)
+            self._video_snapshot = new  # atomic rebind
+            self._dirty_video = True
     
+    def _render_worker(self):
+        """Compose video tiles off the Tk main thread.
+
+        Runs the resize/cvtColor/compose pipeline in a daemon thread and hands
+        finished buffers to the GUI through a one-slot queue (latest wins), so
+        the Tk callback only has to blit.
+        """
+        while self.network.running:
+            # Event-driven: only recompose when something actually changed
+            if self._dirty_video:
+                self._dirty_video = False
+                try:
+                    self._compose_videos()
+                except Exception as e:
+                    print(f"Render worker error: {e}")
+            time.sleep(0.033)
+
+    def _compose_videos(self):
+        """Build the composed tile buffer and queue it for the Tk thread"""
+        canvas_width, canvas_height = self._canvas_size
+        if canvas_width <= 1:
+            return
+
+        # Grab the current snapshot references; no lock needed, the producers
+        # only ever rebind these attributes
+        snapshot = self._video_snapshot
+        local = self._local_video
+
+        videos = [(user, seq, frame) for user, (seq, frame) in snapshot.items()]
+        if local is not None:
+            # Only frames that reach a paint pay the LazyFrame materialization
+            videos.insert(0, (f"{self.username} (You)", local[0],
+                              local[1].materialize()))
+
+        if videos:
+            # Grid geometry only depends on (n, canvas dims); compute once and
+            # reuse the tile coordinates instead of per-tile row/col arithmetic
+            n = len(videos)
+            layout = self._layout_cache.get((n, canvas_width, canvas_height))
+            if layout is None:
+                # Draw inside a centered square region to avoid rectangular look
+                square_size = min(canvas_width, canvas_height)
+                offset_x = (canvas_width - square_size) // 2
+                offset_y = (canvas_height - square_size) // 2
+
+                cols = math.isqrt(n - 1) + 1
+                rows = (n + cols - 1) // cols
+
+                cell_w = square_size // cols
+                cell_h = square_size // rows
+                coords = [((i % cols) * cell_w, (i // cols) * cell_h) for i in range(n)]
+                if len(self._layout_cache) > 32:
+                    self._layout_cache.clear()
+                layout = (square_size, offset_x, offset_y, cols, rows, cell_w, cell_h, coords)
+                self._layout_cache[(n, canvas_width, canvas_height)] = layout
+            square_size, offset_x, offset_y, cols, rows, cell_w, cell_h, coords = layout
+
+            # Skip recomposition entirely when no frame or the layout changed
+            signature = (canvas_width, canvas_height, cols, rows,
+                         tuple((user, seq) for user, seq, _ in videos))
+            if signature == self._compose_signature:
+                return
+            self._compose_signature = signature
+
+            # Alternate buffers so the worker never rewrites pixels the Tk
+            # thread may still be copying into a PhotoImage
+            self._buf_index ^= 1
+            buf = self._canvas_bufs[self._buf_index]
+            if buf is None or buf.shape[0] != square_size:
+                buf = np.empty((square_size, square_size, 4), np.uint8)
+                self._canvas_bufs[self._buf_index] = buf
+            buf[:] = (28, 28, 28, 255)  # canvas background #1C1C1C
+
+            for (x, y), (user, _seq, frame) in zip(coords, videos):
+                w = max(1, cell_w - 10)
+                h = max(1, cell_h - 30)
+
+                channels = frame.shape[2]
+                resized = self._resize_pool.get((w, h, channels))
+                if resized is None:
+                    resized = self._resize_pool[(w, h, channels)] = np.empty((h, w, channels), np.uint8)
+                rgba = self._rgba_pool.get((w, h))
+                if rgba is None:
+                    rgba = self._rgba_pool[(w, h)] = np.empty((h, w, 4), np.uint8)
+                # INTER_AREA when shrinking, INTER_LINEAR when growing
+                interp = cv2.INTER_AREA if w < frame.shape[1] else cv2.INTER_LINEAR
+                cv2.resize(frame, (w, h), dst=resized, interpolation=interp)
+                # One SIMD conversion straight to the RGBA layout Tk wants;
+                # BGRA sources keep their alpha instead of drop-then-re-add
+                code = cv2.COLOR_BGRA2RGBA if channels == 4 else cv2.COLOR_BGR2RGBA
+                cv2.cvtColor(resized, code, dst=rgba)
+                buf[y+5:y+5+h, x+5:x+5+w] = rgba
+
+                # Username label centered under the tile
+                (tw, th), _ = cv2.getTextSize(user, cv2.FONT_HERSHEY_SIMPLEX, 0.5, 1)
+                cv2.putText(buf, user, (x + (cell_w - tw) // 2, y + cell_h - 10),
+                            cv2.FONT_HERSHEY_SIMPLEX, 0.5,
+                            (255, 255, 255, 255), 1, cv2.LINE_AA)
+
+            self._queue_render(('frame', (buf, square_size, offset_x, offset_y)))
+        else:
+            if self._compose_signature is not None:
+                self._compose_signature = None
+                self._queue_render(('empty', (canvas_width, canvas_height)))
+
+    def _queue_render(self, item):
+        """Put a composition result, dropping the stale one if unconsumed"""
+        try:
+            self._render_q.get_nowait()
+        except queue.Empty:
+            pass
+        self._render_q.put(item)
+
     def update_video_display(self):
         """Update video display"""
         if not self.network.running:
             return
-        
+
+        # Single 30 Hz tick: drain the network receive path, then paint.
+        # The old separate 100 Hz after(10) receive loop just multiplied Tk
+        # event-loop wakeups for a drain that is already non-blocking.
+        self.update_video_receive()
+
+        # Blit whatever the render worker produced since last tick. Only the
+        # Tk canvas calls are guarded (against the window being torn down);
+        # programming errors should surface, not be swallowed every tick.
         try:
-            canvas_width = self.video_canvas.winfo_width()
-            canvas_height = self.video_canvas.winfo_height()
-            
-            if canvas_width > 1:
+            kind, payload = self._render_q.get_nowait()
+        except queue.Empty:
+            kind = None
+
+        if kind == 'frame':
+            buf, square_size, offset_x, offset_y = payload
+            # Zero-copy wrap; keep a single PhotoImage ref alive
+            img = Image.frombuffer('RGBA', (square_size, square_size), buf,
+                                   'raw', 'RGBA', 0, 1)
+            try:
+                if (self._video_item is not None
+                        and self._video_photo_size == square_size):
+                    # In-place pixel update: no Tk PhotoImage malloc/free
+                    self._video_photo.paste(img)
+                    self.video_canvas.coords(self._video_item, offset_x, offset_y)
+                else:
+                    self._video_photo = ImageTk.PhotoImage(img)
+                    self._video_photo_size = square_size
+                    self.video_canvas.delete('all')
+                    self._video_item = self.video_canvas.create_image(
+                        offset_x, offset_y, anchor='nw', image=self._video_photo)
+            except tk.TclError:
+                return  # canvas destroyed, window is closing
+        elif kind == 'empty':
+            canvas_width, canvas_height = payload
+            try:
                 self.video_canvas.delete('all')
-                
-                with self.video_lock:
-                    videos = list(self.received_videos.items())
-                
-                # Add local video
-                if self.local_video_frame is not None:
-                    videos.insert(0, (f"{self.username} (You)", self.local_video_frame))
-                
-                if videos:
-                    # Draw inside a centered square region to avoid rectangular look
-                    square_size = min(canvas_width, canvas_height)
-                    offset_x = (canvas_width - square_size) // 2
-                    offset_y = (canvas_height - square_size) // 2
-
-                    cols = int(np.ceil(np.sqrt(len(videos))))
-                    rows = int(np.ceil(len(videos) / cols))
-                    
-                    cell_w = square_size // cols
-                    cell_h = square_size // rows
+                self._video_item = None
+                self._video_photo_size = 0
+                self.video_canvas.create_text(canvas_width//2, canvas_height//2,
+                                             text="No active video streams",
+                                             fill='#A1A1A1', font=self._font_body)
+            except tk.TclError:
+                return
+
+        # Update screen sharing only when it changed (idle clients skip this)
+        if self._dirty_screen:
+            self._dirty_screen = False
+            self._repaint_screen_share()
+
+        self.root.after(33, self.update_video_display)
+
+    def _repaint_screen_share(self):
+        """Repaint the screen-share canvas from the current frame"""
+        try:
+            if self.screen_frame:
+                # Only update if it's a new frame (avoid redundant processing)
+                if self.screen_frame is not self.last_screen_frame:
+                    self.last_screen_frame = self.screen_frame
                     
-                    for idx, (user, frame) in enumerate(videos):
-                        row = idx // cols
-                        col = idx % cols
-                        x = offset_x + col * cell_w
-                        y = offset_y + row * cell_h
-                        
-                        frame_resized = cv2.resize(frame, (max(1, cell_w-10), max(1, cell_h-30)))
-                        frame_rgb = cv2.cvtColor(frame_resized, cv2.COLOR_BGR2RGB)
-                        img = Image.fromarray(frame_rgb)
+                    w = self.screen_canvas.winfo_width()
+                    h = self.screen_canvas.winfo_height()
+                    if w > 1 and h > 1:
+                        # Draw the screen image proportionally to the canvas size (not forced
+                        # square); resize never mutates its source, so no defensive copy
+                        img = self.screen_frame
+                        img_w, img_h = img.size
+                        # Reserve header area (30px)
+                        header_h = 30
+                        avail_w = max(1, w - 20)
+                        avail_h = max(1, h - header_h - 10)
+                        scale = min(avail_w / img_w, avail_h / img_h)
+                        new_w = max(1, int(img_w * scale))
+                        new_h = max(1, int(img_h * scale))
+
+                        # This branch only runs for a frame that hasn't been
+                        # painted yet, so there is nothing to cache; BILINEAR
+                        # is fine for viewing and far cheaper than LANCZOS
+                        img = img.resize((new_w, new_h), Image.BILINEAR)
                         photo = ImageTk.PhotoImage(img)
-                        
-                        self.video_canvas.create_image(x+5, y+5, anchor='nw', image=photo)
-                        self.video_canvas.create_text(x+cell_w//2, y+cell_h-10,
-                                                     text=user, fill='#FFFFFF',
-                                                     font=('Segoe UI', 13, 'bold'))
-                        
-                        if not hasattr(self, '_vid_refs'):
-                            self._vid_refs = []
-                        self._vid_refs.append(photo)
-                    
-                    self._vid_refs = self._vid_refs[-20:]  # Keep last 20
-                else:
-                    self.video_canvas.create_text(canvas_width//2, canvas_height//2,
-                                                 text="No active video streams",
-                                                 fill='#A1A1A1', font=('Segoe UI', 14))
-                
-                # Update screen sharing
-                if self.screen_frame:
-                    # Only update if it's a new frame (avoid redundant processing)
-                    if self.screen_frame is not self.last_screen_frame:
-                        self.last_screen_frame = self.screen_frame
-                        
-                        w = self.screen_canvas.winfo_width()
-                        h = self.screen_canvas.winfo_height()
-                        if w > 1 and h > 1:
-                            # Draw the screen image proportionally to the canvas size (not forced square)
-                            img = self.screen_frame.copy()
-                            img_w, img_h = img.size
-                            # Reserve header area (30px)
-                            header_h = 30
-                            avail_w = max(1, w - 20)
-                            avail_h = max(1, h - header_h - 10)
-                            scale = min(avail_w / img_w, avail_h / img_h)
-                            new_w = max(1, int(img_w * scale))
-                            new_h = max(1, int(img_h * scale))
-
-                            img = img.resize((new_w, new_h), Image.LANCZOS)
-                            photo = ImageTk.PhotoImage(img)
 
-                            self.screen_canvas.delete('all')
+                        # Center image below header
+                        center_x = w // 2
+                        center_y = header_h + (avail_h // 2)
+                        presenter_text = f"{self.presenter_name}'s Screen" if self.presenter_name else "Screen Share"
 
-                            # Center image below header
-                            center_x = w // 2
-                            center_y = header_h + (avail_h // 2)
-                            self.screen_canvas.create_image(center_x, center_y, anchor='center', image=photo)
+                        if self._screen_items is None:
+                            # First paint: create persistent items once
+                            self.screen_canvas.delete('all')
+                            img_item = self.screen_canvas.create_image(
+                                center_x, center_y, anchor='center', image=photo)
+                            rect_item = self.screen_canvas.create_rectangle(
+                                0, 0, w, header_h, fill='#232323', outline='')
+                            text_item = self.screen_canvas.create_text(
+                                w//2, header_h//2, text=presenter_text,
+                                fill='#FFFFFF', font=self._font_header)
+                            self._screen_items = (img_item, rect_item, text_item)
+                            self._last_presenter_text = presenter_text
+                        else:
+                            # Later frames just retarget the existing items;
+                            # no item churn or z-order recomputation
+                            img_item, rect_item, text_item = self._screen_items
+                            self.screen_canvas.coords(img_item, center_x, center_y)
+                            self.screen_canvas.itemconfigure(img_item, image=photo)
+                            self.screen_canvas.coords(rect_item, 0, 0, w, header_h)
+                            self.screen_canvas.coords(text_item, w//2, header_h//2)
+                            # Re-rasterize the header only when the presenter changes
+                            if presenter_text != self._last_presenter_text:
+                                self.screen_canvas.itemconfigure(text_item, text=presenter_text)
+                                self._last_presenter_text = presenter_text
 
-                            # Presenter header full width
-                            presenter_text = f"{self.presenter_name}'s Screen" if self.presenter_name else "Screen Share"
-                            self.screen_canvas.create_rectangle(0, 0, w, header_h, fill='#232323', outline='')
-                            self.screen_canvas.create_text(w//2, header_h//2, text=presenter_text,
-                                                          fill='#FFFFFF', font=('Segoe UI', 14, 'bold'))
+                        self._screen_ref = photo
+            else:
+                # Clear canvas when no presentation
+                if self.last_screen_frame is not None:
+                    self.last_screen_frame = None
+                    self.screen_canvas.delete('all')
+                    self._screen_items = None
+                    self._last_presenter_text = None
+                    # Show placeholder text
+                    w = self.screen_canvas.winfo_width()
+                    h = self.screen_canvas.winfo_height()
+                    if w > 1:
+                        self.screen_canvas.create_text(w//2, h//2,
+                                                      text="No screen sharing active",
+                                                      fill='#A1A1A1', font=self._font_body)
+        except tk.TclError:
+            pass  # canvas destroyed, window is closing
 
-                            self._screen_ref = photo
-                else:
-                    # Clear canvas when no presentation
-                    if self.last_screen_frame is not None:
-                        self.last_screen_frame = None
-                        self.screen_canvas.delete('all')
-                        # Show placeholder text
-                        w = self.screen_canvas.winfo_width()
-                        h = self.screen_canvas.winfo_height()
-                        if w > 1:
-                            self.screen_canvas.create_text(w//2, h//2,
-                                                          text="No screen sharing active",
-                                                          fill='#A1A1A1', font=('Segoe UI', 14))
-        except Exception as e:
-            print(f"Display error: {e}")
-        
-        self.root.after(33, self.update_video_display)
-    
     def toggle_video(self):
         """Toggle video"""
         if not self.media:
@@ -555,7 +823,8 @@ class LANCommClientGUI:
                 messagebox.showerror("Video Error", msg)
         else:
             self.media.stop_video()
-            self.local_video_frame = None
+            self._local_video = None
+            self._dirty_video = True
             self.video_btn.config(text="🎥 Start Video")
             self._style_primary(self.video_btn)
     
@@ -594,13 +863,14 @@ class LANCommClientGUI:
             self.present_btn.config(text="🖥 Start Presenting")
             self._style_primary(self.present_btn)
             self.screen_frame = None  # Clear screen frame when stopping
+            self._dirty_screen = True
     
     def send_chat(self):
         """Send chat message"""
         msg = self.chat_input.get().strip()
         if msg and self.network.connected:
             # Group or private depending on mode
-            if getattr(self, 'current_chat_target', None):
+            if self.current_chat_target:
                 self.network.send_tcp_message({
                     'type': 'private_chat',
                     'to': self.current_chat_target,
@@ -622,24 +892,50 @@ class LANCommClientGUI:
         """Upload file"""
         filepath = filedialog.askopenfilename(title="Select File to Upload")
         if filepath:
-            try:
-                with open(filepath, 'rb') as f:
-                    data = f.read()
-                
-                filename = os.path.basename(filepath)
-                file_id = f"{self.username}_{int(datetime.now().timestamp())}_{filename}"
-                
-                self.network.send_tcp_message({
-                    'type': 'file_upload',
-                    'file_id': file_id,
-                    'filename': filename,
-                    'size': len(data),
-                    'data': base64.b64encode(data).decode('utf-8')
-                })
-                
-                messagebox.showinfo("Upload", f"File '{filename}' uploaded successfully")
-            except Exception as e:
-                messagebox.showerror("Upload Error", str(e))
+            filename = os.path.basename(filepath)
+            # Direct clock read, and ns resolution avoids id collisions for
+            # back-to-back uploads
+            file_id = f"{self.username}_{time.time_ns()}_{filename}"
+            # Read and send on the IO pool, like downloads, so a multi-GB
+            # upload never stalls the Tk main loop
+            self._io_pool.submit(self._upload_worker, filepath, filename,
+                                 file_id)
+
+    def _upload_worker(self, filepath, filename, file_id):
+        """Stream a file upload in bounded chunks off the GUI thread"""
+        try:
+            size = os.path.getsize(filepath)
+            self.network.send_tcp_message({
+                'type': 'file_upload_begin',
+                'file_id': file_id,
+                'filename': filename,
+                'size': size
+            })
+            with open(filepath, 'rb') as f:
+                seq = 0
+                while True:
+                    # Hold the read loop while the sender is behind, so the
+                    # in-flight window stays a few chunks deep instead of
+                    # the whole file piling up in the send queue
+                    while (self.network.send_queue.qsize() > 8
+                           and self.network.running):
+                        time.sleep(0.01)
+                    chunk = f.read(262144)  # 256 KiB
+                    if not chunk:
+                        break
+                    self.network.send_tcp_binary(
+                        {'type': 'file_chunk', 'file_id': file_id, 'seq': seq}, chunk)
+                    seq += 1
+            self.network.send_tcp_message({
+                'type': 'file_upload_end',
+                'file_id': file_id
+            })
+
+            self.root.after(0, lambda: messagebox.showinfo(
+                "Upload", f"File '{filename}' uploaded successfully"))
+        except Exception as e:
+            self.root.after(0, lambda err=e: messagebox.showerror(
+                "Upload Error", str(err)))
     
     def download_file(self, file_id):
         """Request download for a given file_id"""
@@ -651,19 +947,14 @@ class LANCommClientGUI:
             except Exception as e:
                 # Surface error without killing app
                 self.root.after(0, lambda err=e: messagebox.showerror("Download Error", str(err)))
-        t = threading.Thread(target=_send, daemon=True)
-        t.start()
+        self._io_pool.submit(_send)
 
     def _insert_clickable_file_message(self, uploader, filename, file_id, size):
         """Insert a clickable file entry inside the chat log"""
-        self.chat_display.config(state='normal')
-        ts = datetime.now().strftime('%H:%M:%S')
+        ts = _hms()
         tag = f"file_{file_id}"
-        display_text = f"[{ts}] {uploader} shared: "
-        self.chat_display.insert(tk.END, display_text)
-        start_index = self.chat_display.index(tk.INSERT)
-        self.chat_display.insert(tk.END, f"📎 {filename} ({size} B)\n", tag)
-        end_index = self.chat_display.index(tk.INSERT)
+        self.chat_display.insert(tk.END, f"[{ts}] {uploader} shared: ", 'ts',
+                                 f"📎 {filename} ({size} B)\n", tag)
 
         # Style and bind click
         self.chat_display.tag_config(tag, foreground='#2D8CFF', underline=True)
@@ -674,126 +965,161 @@ class LANCommClientGUI:
                 messagebox.showerror("Download Error", str(e))
         self.chat_display.tag_bind(tag, '<Button-1>', on_click)
 
-        # Subtle timestamp color
-        self.chat_display.tag_config('ts', foreground='#A1A1A1')
         self.chat_display.see(tk.END)
-        self.chat_display.config(state='disabled')
     
     # Callback methods
     def on_server_message(self, msg):
-        """Handle server messages"""
-        msg_type = msg.get('type')
-        
-        if msg_type == 'welcome':
-            self.add_chat("System", msg['message'], '#3FB950')
-            self.update_users(msg.get('users', []))
-        
-        elif msg_type == 'user_joined':
-            self.add_chat("System", f"{msg['username']} joined", '#2D8CFF')
-            self.update_users(msg.get('users', []))
-        
-        elif msg_type == 'user_left':
-            self.add_chat("System", f"{msg['username']} left", '#E74C3C')
-            self.update_users(msg.get('users', []))
-            with self.video_lock:
-                self.received_videos.pop(msg['username'], None)
-        
-        elif msg_type == 'chat':
-            self.add_chat(msg['username'], msg['message'])
-        
-        elif msg_type == 'private_chat':
-            # Display private messages distinctly
-            sender = (msg.get('from') or '').strip()
-            recipient = (msg.get('to') or '').strip()
-            text = msg.get('message', '')
+        """Handle server messages via one hash lookup instead of an elif chain"""
+        handler = self._msg_handlers.get(msg.get('type'))
+        if handler:
+            handler(msg)
+
+    def _on_welcome(self, msg):
+        # Adopt the server-assigned id that tags our UDP packets, and the
+        # roster mapping for everyone else's
+        self.network.set_client_id(msg.get('client_id', 0))
+        self.network.set_user_ids(msg.get('client_ids', {}))
+        self.add_chat("System", msg['message'], '#3FB950')
+        self.update_users(msg.get('users', []))
+
+    def _on_user_joined(self, msg):
+        self.network.set_user_ids(msg.get('client_ids', {}))
+        self.add_chat("System", f"{msg['username']} joined", '#2D8CFF')
+        self.update_users(msg.get('users', []))
+
+    def _on_user_left(self, msg):
+        self.network.set_user_ids(msg.get('client_ids', {}))
+        self.add_chat("System", f"{msg['username']} left", '#E74C3C')
+        self.update_users(msg.get('users', []))
+        # The snapshot's copy-and-rebind writers must not race: frame drains
+        # happen on the Tk thread, so marshal the removal there too instead
+        # of rebinding from this receive thread
+        self.root.after(0, self._drop_video_tile, msg['username'])
+
+    def _drop_video_tile(self, username):
+        """Remove a departed user's video tile (runs on the Tk thread)"""
+        snapshot = self._video_snapshot
+        if username in snapshot:
+            new = dict(snapshot)
+            del new[username]
+            self._video_snapshot = new  # atomic rebind
+        self._dirty_video = True
+
+    def _on_chat(self, msg):
+        self.add_chat(msg['username'], msg['message'])
+
+    def _on_private_chat(self, msg):
+        # Display private messages distinctly
+        sender = (msg.get('from') or '').strip()
+        recipient = (msg.get('to') or '').strip()
+        text = msg.get('message', '')
+        if DEBUG:
             print(f"[GUI PM] from={sender} to={recipient} text={text}")
-            me = (self.username or '').strip()
-            if sender.lower() == me.lower():
-                label = f"[Private ➜ {recipient}]"
-                color = '#FFD166'  # amber
-                self.add_chat(label, text, color)
-            elif recipient.lower() == me.lower():
-                label = f"[Private from {sender}]"
-                color = '#FFD166'
-                self.add_chat(label, text, color)
-        
-        elif msg_type == 'presentation_started':
-            self.presenter_name = msg['username']
-            presenter_msg = "You are presenting" if msg['username'] == self.username else f"{msg['username']} is presenting"
-            self.add_chat("System", presenter_msg, '#2D8CFF')
-            # Update Present button state for all clients
-            if hasattr(self, 'present_btn'):
-                if msg['username'] == self.username:
-                    # You are the presenter
-                    self.present_btn.config(text="⏹ Stop Presenting", state='normal')
-                    self._style_danger(self.present_btn)
-                else:
-                    # Someone else is presenting; disable your ability to start
-                    self.present_btn.config(text=f"{msg['username']} is screen sharing", state='disabled')
-                    self._style_disabled(self.present_btn)
-        
-        elif msg_type == 'presentation_stopped':
-            stop_msg = "You stopped presenting" if self.presenter_name == self.username else f"{self.presenter_name} stopped presenting"
-            self.add_chat("System", stop_msg, '#2D8CFF')
-            self.presenter_name = None
-            self.screen_frame = None
-            # Restore Present button for everyone not presenting
-            if hasattr(self, 'present_btn'):
-                self.present_btn.config(text="🖥 Start Presenting", state='normal')
-                self._style_primary(self.present_btn)
-            # Canvas will be cleared automatically
-        
-        elif msg_type == 'screen_frame':
-            try:
-                from io import BytesIO
-                frame_id = msg.get('frame_id')
-                data_b64 = msg['frame_data']
-                print(f"[SCREEN] Incoming frame: base64 bytes={len(data_b64)}, from {msg.get('username', 'unknown')} frame_id={frame_id}")
-                data = base64.b64decode(data_b64)
-                try:
-                    img = Image.open(BytesIO(data))
-                    img.load()  # Force loading to catch errors
-                except Exception as e:
-                    print(f"[SCREEN] Error decoding frame (not PNG/JPG?): {e}")
-                    return
-                # If already showing this frame, skip update
-                if getattr(self, '_last_screen_frame_id', None) == frame_id:
-                    return
-                self.screen_frame = img
-                self._last_screen_frame_id = frame_id
-                print(f"[SCREEN] Received decoded frame: size={img.size} mode={img.mode}")
-            except Exception as e:
-                print(f"[SCREEN] Error decoding screen frame: {e}")
-                import traceback
-                traceback.print_exc()
-        
-        elif msg_type == 'file_available':
-            self.available_files[msg['file_id']] = {
-                'filename': msg['filename'],
-                'size': msg['size'],
-                'uploader': msg['uploader']
-            }
-            # Insert clickable file entry directly in chat
-            self.root.after(0, lambda: self._insert_clickable_file_message(
-                msg['uploader'], msg['filename'], msg['file_id'], msg['size']
-            ))
-        
-        elif msg_type == 'file_data':
+        # Compare against the identity normalized once at connect time
+        if sender.lower() == self._username_norm:
+            label = f"[Private ➜ {recipient}]"
+            color = '#FFD166'  # amber
+            self.add_chat(label, text, color)
+        elif recipient.lower() == self._username_norm:
+            label = f"[Private from {sender}]"
+            color = '#FFD166'
+            self.add_chat(label, text, color)
+
+    def _on_presentation_started(self, msg):
+        self.presenter_name = msg['username']
+        self._newest_screen_frame_id = -1  # frame ids restart per presentation
+        presenter_msg = "You are presenting" if msg['username'] == self.username else f"{msg['username']} is presenting"
+        self.add_chat("System", presenter_msg, '#2D8CFF')
+        # Update Present button state for all clients
+        if hasattr(self, 'present_btn'):
+            if msg['username'] == self.username:
+                # You are the presenter
+                self.present_btn.config(text="⏹ Stop Presenting", state='normal')
+                self._style_danger(self.present_btn)
+            else:
+                # Someone else is presenting; disable your ability to start
+                self.present_btn.config(text=f"{msg['username']} is screen sharing", state='disabled')
+                self._style_disabled(self.present_btn)
+
+    def _on_presentation_stopped(self, msg):
+        stop_msg = "You stopped presenting" if self.presenter_name == self.username else f"{self.presenter_name} stopped presenting"
+        self.add_chat("System", stop_msg, '#2D8CFF')
+        self.presenter_name = None
+        self.screen_frame = None
+        self._dirty_screen = True
+        # Restore Present button for everyone not presenting
+        if hasattr(self, 'present_btn'):
+            self.present_btn.config(text="🖥 Start Presenting", state='normal')
+            self._style_primary(self.present_btn)
+        # Canvas will be cleared automatically
+
+    def _on_screen_frame(self, msg):
+        # Drop stale frames here, before any image decode work
+        frame_id = msg.get('frame_id', 0)
+        if frame_id <= self._newest_screen_frame_id:
+            return
+        self._newest_screen_frame_id = frame_id
+        self._decode_pool.submit(self._decode_screen_frame, frame_id, msg['payload'])
+
+    def _on_file_available(self, msg):
+        self.available_files[msg['file_id']] = FileEntry(
+            msg['filename'], msg['size'], msg['uploader'])
+        # Insert clickable file entry directly in chat
+        self.root.after(0, lambda: self._insert_clickable_file_message(
+            msg['uploader'], msg['filename'], msg['file_id'], msg['size']
+        ))
+
+    def _on_file_data(self, msg):
+        try:
+            filename = msg['filename']
+            data = msg['payload']
+            # Run dialog and file write on the main thread to avoid crashes
+            self.root.after(0, lambda: self._handle_file_save(filename, data))
+        except Exception as e:
+            self.root.after(0, lambda err=e: messagebox.showerror("Download Error", str(err)))
+
+    def _decode_screen_frame(self, frame_id, data):
+        """Decode a screen frame on the pool thread and publish it to Tk"""
+        try:
+            # A newer frame arrived while this one waited in the pool queue
+            if frame_id < self._newest_screen_frame_id:
+                return
             try:
-                filename = msg['filename']
-                data = base64.b64decode(msg['data'])
-                # Run dialog and file write on the main thread to avoid crashes
-                self.root.after(0, lambda: self._handle_file_save(filename, data))
+                bio = self._screen_bio
+                bio.seek(0)
+                bio.truncate()
+                bio.write(data)
+                bio.seek(0)
+                img = Image.open(bio)
+                if self._screen_display_size:
+                    # JPEG frames decode at 1/2, 1/4 or 1/8 scale in the DCT
+                    # domain when the display is smaller; no-op for PNG
+                    img.draft('RGB', self._screen_display_size)
+                img.load()  # Force loading to catch errors
             except Exception as e:
-                self.root.after(0, lambda err=e: messagebox.showerror("Download Error", str(err)))
-    
+                print(f"[SCREEN] Error decoding frame (not PNG/JPG?): {e}")
+                return
+            self.root.after(0, self._publish_screen_frame, frame_id, img)
+        except Exception as e:
+            print(f"[SCREEN] Error decoding screen frame: {e}")
+            import traceback
+            traceback.print_exc()
+
+    def _publish_screen_frame(self, frame_id, img):
+        """Swap in a freshly decoded screen frame (runs on the Tk thread)"""
+        self.screen_frame = img
+        self._dirty_screen = True
+
     def on_local_video_frame(self, frame):
         """Callback for local video frame"""
-        self.local_video_frame = frame
+        local = self._local_video
+        self._local_video = ((local[0] + 1) if local else 1, frame)
+        self._dirty_video = True
     
     def on_local_screen_frame(self, frame):
         """Callback for local screen frame (presenter sees their own screen)"""
         self.screen_frame = frame
+        self._dirty_screen = True
     
     def on_disconnected(self):
         """Handle disconnection"""
@@ -806,12 +1132,21 @@ class LANCommClientGUI:
         self.root.after(0, lambda: self._update_users(users))
     
     def _update_users(self, users):
-        """Internal update users"""
-        if hasattr(self, 'users_listbox'):
-            self.users_listbox.delete(0, tk.END)
-            for user in users:
+        """Internal update users; only touches rows that actually changed"""
+        if not hasattr(self, 'users_listbox'):
+            return
+        removed = set(self._last_users) - set(users)
+        added = set(users) - set(self._last_users)
+        # Delete from the bottom up so earlier indices stay valid
+        for i in range(len(self._last_users) - 1, -1, -1):
+            if self._last_users[i] in removed:
+                self.users_listbox.delete(i)
+        for user in users:
+            if user in added:
                 prefix = '● ' if user == self.username else '  '
                 self.users_listbox.insert(tk.END, f"{prefix}{user}")
+        self._last_users = [u for u in self._last_users if u not in removed] + \
+                           [u for u in users if u in added]
 
     def _on_user_selected(self, event):
         """Toggle private chat mode when selecting a user in the list."""
@@ -829,7 +1164,7 @@ class LANCommClientGUI:
                 self.chat_mode_label.config(text="Group Chat")
                 return
             # Toggle if clicking same user again
-            if getattr(self, 'current_chat_target', None) == name:
+            if self.current_chat_target == name:
                 self.current_chat_target = None
                 self.chat_mode_label.config(text="Group Chat")
                 self.add_chat("System", "Switched to Group Chat", '#2D8CFF')
@@ -841,31 +1176,43 @@ class LANCommClientGUI:
             print(f"User select error: {e}")
     
     def add_chat(self, username, message, color='#ecf0f1'):
-        """Add chat message"""
-        self.root.after(0, lambda: self._add_chat(username, message, color))
-    
+        """Queue a chat message for the next batched flush"""
+        self._chat_queue.append((username, message, color))
+        if not self._chat_flush_scheduled:
+            self._chat_flush_scheduled = True
+            self.root.after(16, self._flush_chat)
+
+    def _flush_chat(self):
+        """Insert all pending chat messages, then scroll once"""
+        self._chat_flush_scheduled = False
+        if not self._chat_queue:
+            return
+        while self._chat_queue:
+            username, message, color = self._chat_queue.popleft()
+            self._add_chat(username, message, color)
+        self.chat_display.see(tk.END)
+
     def _add_chat(self, username, message, color):
         """Internal add chat"""
-        self.chat_display.config(state='normal')
-        ts = datetime.now().strftime('%H:%M:%S')
-        
+        ts = _hms()
+
         if username == "System":
-            self.chat_display.insert(tk.END, f"[{ts}] ", 'ts')
-            self.chat_display.insert(tk.END, f"{message}\n", 'sys')
-            self.chat_display.tag_config('sys', foreground=color, font=('Segoe UI', 14, 'italic'))
+            tag = self._sys_color_tags.get(color)
+            if tag is None:
+                tag = f"sys_{color.lstrip('#')}"
+                self.chat_display.tag_config(tag, foreground=color, font=('Segoe UI', 14, 'italic'))
+                self._sys_color_tags[color] = tag
+            # One insert call with interleaved (text, tag) pairs instead of
+            # one Tcl round-trip per segment
+            self.chat_display.insert(tk.END, f"[{ts}] ", 'ts', f"{message}\n", tag)
         else:
-            self.chat_display.insert(tk.END, f"[{ts}] ", 'ts')
-            self.chat_display.insert(tk.END, f"{username}: ", 'user')
-            self.chat_display.insert(tk.END, f"{message}\n")
-            self.chat_display.tag_config('user', foreground='#2D8CFF', font=('Segoe UI', 14, 'bold'))
-        
-        self.chat_display.tag_config('ts', foreground='#A1A1A1')
-        self.chat_display.see(tk.END)
-        self.chat_display.config(state='disabled')
+            self.chat_display.insert(tk.END, f"[{ts}] ", 'ts',
+                                     f"{username}: ", 'user',
+                                     f"{message}\n", ())
     
     def toggle_users_panel(self):
         """Show/hide the embedded Online Users list inside chat"""
-        self._users_visible = not getattr(self, '_users_visible', False)
+        self._users_visible = not self._users_visible
         if self._users_visible:
             # Show below the input, before auto-scroll area end
             self.users_section.pack(fill='x', padx=8, pady=(0, 8))
@@ -884,7 +1231,10 @@ class LANCommClientGUI:
         
         if self.network:
             self.network.disconnect()
-        
+
+        self._decode_pool.shutdown(wait=False)
+        self._io_pool.shutdown(wait=False)
+
         self.root.destroy()
     
     def run(self):
@@ -892,7 +1242,14 @@ class LANCommClientGUI:
         self.root.mainloop()
 
     def _on_right_section_resize(self, event):
+        """Debounce <Configure> storms during drags; apply the last size once"""
+        if self._resize_job is not None:
+            self.root.after_cancel(self._resize_job)
+        self._resize_job = self.root.after(50, self._apply_right_section_resize)
+
+    def _apply_right_section_resize(self):
         """Size screen share row to match current screen frame aspect; chat gets remaining space."""
+        self._resize_job = None
         try:
             if not hasattr(self, 'right_section'):
                 return
@@ -900,7 +1257,7 @@ class LANCommClientGUI:
             header_h = 30
             # Determine aspect ratio from current screen frame if available; fallback to 16:9
             aspect_h_over_w = None
-            if getattr(self, 'screen_frame', None) is not None:
+            if self.screen_frame is not None:
                 try:
                     img_w, img_h = self.screen_frame.size
                     if img_w > 0:
@@ -910,6 +1267,9 @@ class LANCommClientGUI:
             if aspect_h_over_w is None:
                 aspect_h_over_w = 9/16
             desired_h = int(width * aspect_h_over_w) + header_h
+            if width > 0:
+                # Lets the decoder shrink JPEG frames toward what is shown
+                self._screen_display_size = (width, desired_h - header_h)
             self.right_section.grid_rowconfigure(0, minsize=desired_h)
             # Ensure chat row stretches to fill remaining space
             self.right_section.grid_rowconfigure(1, weight=1)
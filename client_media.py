@@ -14,6 +14,64 @@ import platform
 import random
 import string
 
+try:
+    import simplejpeg  # thin libjpeg-turbo binding; optional
+except ImportError:
+    simplejpeg = None
+
+DEBUG = False  # per-frame tracing; formatting + stdout locking is costly in send loops
+
+
+def _encode_jpeg(frame, quality=50):
+    """JPEG-encode a BGR frame, via libjpeg-turbo directly when available"""
+    if isinstance(frame, cv2.UMat):
+        # Transparent API frame: imencode dispatches through OpenCL, so the
+        # colorspace pass runs on the device the resize left the pixels on
+        _, buffer = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, quality])
+        return buffer.tobytes()
+    if simplejpeg is not None:
+        return simplejpeg.encode_jpeg(np.ascontiguousarray(frame),
+                                      quality=quality, colorspace='BGR',
+                                      fastdct=True)
+    _, buffer = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, quality])
+    return buffer.tobytes()
+
+
+def _decode_jpeg(data):
+    """Decode JPEG bytes to a BGR frame, or None on failure"""
+    try:
+        if simplejpeg is not None:
+            return simplejpeg.decode_jpeg(data, colorspace='BGR')
+        return cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+    except Exception:
+        return None
+
+
+class LazyFrame:
+    """Local-preview frame that defers materialization to paint time.
+
+    The encode loop hands the GUI one of these per capture; display usually
+    runs slower than capture, so frames superseded before a paint never pay
+    the device download. A frame painted more than once converts only once.
+    """
+
+    __slots__ = ('_raw', '_bgr')
+
+    def __init__(self, raw):
+        self._raw = raw
+        self._bgr = None
+
+    def materialize(self):
+        """Return the frame as a BGR ndarray, downloading from the device
+        on first call"""
+        if self._bgr is None:
+            raw = self._raw
+            if isinstance(raw, cv2.UMat):
+                raw = raw.get()
+            self._bgr = raw
+            self._raw = None
+        return self._bgr
+
 
 class MediaHandler:
     def __init__(self, network, callback):
@@ -24,16 +82,31 @@ class MediaHandler:
         self.video_capture = None
         self.video_streaming = False
         self.video_thread = None
+        self.video_encode_thread = None
+        # Single-producer/single-consumer handoff from capture to encode:
+        # rebinding _enc_slot is atomic under the GIL, so the newest frame
+        # always wins with no queue lock or Full/Empty exception traffic
+        self._enc_slot = None
+        self._enc_event = threading.Event()
+        self._use_umat = False
+        # Per-user reassembly state for the server's sub-MTU video
+        # fragments; partial frames survive across receive calls
+        self._video_reasm = {}  # {user: [frame_id, count, {index: chunk}]}
         
         # Audio
         self.audio = None
         self.audio_streaming = False
-        self.audio_capture_thread = None
+        self.audio_input_stream = None
         self.audio_playback_thread = None
         self.audio_format = pyaudio.paInt16
         self.audio_channels = 1
         self.audio_rate = 16000
         self.audio_chunk = 1024
+        # Coalesce this many capture chunks into one UDP packet; 2 chunks at
+        # 1024/16000 adds 64 ms latency and halves packet-path syscalls on
+        # every hop (client send, server relay, client receive)
+        self.audio_max_batch = 2
+        self._audio_batch = []
         
         # Screen sharing
         self.presenting = False
@@ -51,10 +124,17 @@ class MediaHandler:
             self.video_capture = cv2.VideoCapture(0)
             if not self.video_capture.isOpened():
                 return False, "Failed to open camera"
-            
+            # Bound driver-side queueing so stale frames can't pile up
+            self.video_capture.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+            # With an OpenCL device available, route frames through the
+            # Transparent API so resize and encode skip CPU round-trips
+            self._use_umat = cv2.ocl.haveOpenCL()
+
             self.video_streaming = True
             self.video_thread = threading.Thread(target=self._video_capture_loop, daemon=True)
             self.video_thread.start()
+            self.video_encode_thread = threading.Thread(target=self._video_encode_loop, daemon=True)
+            self.video_encode_thread.start()
             return True, "Video started"
         except Exception as e:
             return False, str(e)
@@ -68,47 +148,103 @@ class MediaHandler:
     
     def _video_capture_loop(self):
         """Video capture and send loop"""
+        interval = 1.0 / 30
+        next_deadline = time.monotonic() + interval
         while self.video_streaming:
             try:
-                ret, frame = self.video_capture.read()
+                # grab() advances the driver queue without decoding; when the
+                # loop has fallen behind, keep grabbing so only the freshest
+                # frame pays the YUV->BGR decode in retrieve()
+                if not self.video_capture.grab():
+                    continue
+                while time.monotonic() - next_deadline > interval:
+                    self.video_capture.grab()
+                    next_deadline += interval
+                ret, frame = self.video_capture.retrieve()
                 if not ret:
                     continue
-                
-                # Resize and compress
-                frame = cv2.resize(frame, (320, 240))
-                _, buffer = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, 50])
-                
-                # Send packet
-                self.network.send_video_packet(buffer.tobytes())
-                
-                # Also make available for local display
-                self.callback.on_local_video_frame(frame)
-                
-                time.sleep(0.033)  # ~30 FPS
+
+                # Resize here (INTER_AREA: SIMD box filter for downscale) and
+                # hand off to the encoder thread; overwriting the slot drops
+                # the previous frame if it hasn't been picked up yet. On the
+                # UMat path the result stays on the device for the encoder
+                if self._use_umat:
+                    frame = cv2.resize(cv2.UMat(frame), (320, 240),
+                                       interpolation=cv2.INTER_AREA)
+                else:
+                    frame = cv2.resize(frame, (320, 240), interpolation=cv2.INTER_AREA)
+                self._enc_slot = frame
+                self._enc_event.set()
+
+                # Pace against a monotonic deadline so the ~30 FPS cadence
+                # doesn't drift with processing time
+                next_deadline += interval
+                delay = next_deadline - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+                else:
+                    next_deadline = time.monotonic()
             except Exception as e:
                 print(f"Video capture error: {e}")
                 break
-    
+
+    def _video_encode_loop(self):
+        """Encode and send loop; overlaps JPEG encode with the next capture"""
+        while self.video_streaming:
+            if not self._enc_event.wait(timeout=0.1):
+                continue
+            self._enc_event.clear()
+            frame = self._enc_slot
+            if frame is None:
+                continue
+            try:
+                jpeg_bytes = _encode_jpeg(frame, quality=50)
+                self.network.send_video_packet(jpeg_bytes)
+                # Also make available for local display; the wrapper defers
+                # any device download until the GUI actually paints the frame
+                self.callback.on_local_video_frame(LazyFrame(frame))
+            except Exception as e:
+                print(f"Video encode error: {e}")
+                break
+
     def receive_video_frames(self):
         """Receive video frames from network"""
-        frames = {}
+        # Drain everything pending, reassembling the server's sub-MTU
+        # fragments and keeping only the newest frame per user so superseded
+        # frames never pay a decode. Method and attribute lookups are
+        # hoisted out of the per-packet loop
+        reasm = self._video_reasm
+        recv_packet = self.network.receive_video_packet_nonblocking
+        own_name = self.network.username
         while True:
-            username, frame_data = self.network.receive_video_packet(timeout=0.001)
+            username, frame_id, index, count, chunk = recv_packet()
             if username is None:
                 break
-            
+
             # Don't process own video frames (server shouldn't send them, but double-check)
-            if username == self.network.username:
+            if username == own_name:
                 continue
-            
-            try:
-                nparr = np.frombuffer(frame_data, np.uint8)
-                frame = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-                if frame is not None:
-                    frames[username] = frame
-            except:
-                pass
-        
+
+            entry = reasm.get(username)
+            if entry is None or frame_id > entry[0]:
+                # Newer frame supersedes any partial older one
+                reasm[username] = [frame_id, count, {index: chunk}]
+            elif frame_id == entry[0]:
+                entry[2][index] = chunk
+            # Fragments of frames older than the current one are dropped
+
+        frames = {}
+        for username in list(reasm):
+            frame_id, count, parts = reasm[username]
+            if len(parts) < count:
+                continue  # still waiting on fragments; keep for next drain
+            del reasm[username]
+            data = parts[0] if count == 1 else b''.join(
+                parts[i] for i in sorted(parts))
+            frame = _decode_jpeg(data)
+            if frame is not None:
+                frames[username] = frame
+
         return frames
     
     # Audio methods
@@ -117,12 +253,20 @@ class MediaHandler:
         try:
             self.audio = pyaudio.PyAudio()
             self.audio_streaming = True
-            
-            # Start capture thread
-            self.audio_capture_thread = threading.Thread(
-                target=self._audio_capture_loop, daemon=True)
-            self.audio_capture_thread.start()
-            
+
+            # Capture runs on PortAudio's callback thread: each chunk arrives
+            # as a zero-copy view into PortAudio's own buffer and is forwarded
+            # straight to sendto, with no per-chunk Python-side allocation
+            self.audio_input_stream = self.audio.open(
+                format=self.audio_format,
+                channels=self.audio_channels,
+                rate=self.audio_rate,
+                input=True,
+                frames_per_buffer=self.audio_chunk,
+                stream_callback=self._audio_capture_callback
+            )
+            self.audio_input_stream.start_stream()
+
             # Start playback thread
             self.audio_playback_thread = threading.Thread(
                 target=self._audio_playback_loop, daemon=True)
@@ -135,10 +279,15 @@ class MediaHandler:
     def stop_audio(self):
         """Stop audio streaming"""
         self.audio_streaming = False
-        
-        # Wait for threads to finish (with timeout)
-        if self.audio_capture_thread and self.audio_capture_thread.is_alive():
-            self.audio_capture_thread.join(timeout=2.0)
+
+        # Stop the capture stream and wait for playback to finish
+        if self.audio_input_stream:
+            try:
+                self.audio_input_stream.stop_stream()
+                self.audio_input_stream.close()
+            except Exception as e:
+                print(f"Error stopping audio capture: {e}")
+            self.audio_input_stream = None
         if self.audio_playback_thread and self.audio_playback_thread.is_alive():
             self.audio_playback_thread.join(timeout=2.0)
         
@@ -150,35 +299,21 @@ class MediaHandler:
                 print(f"Error terminating audio: {e}")
             self.audio = None
     
-    def _audio_capture_loop(self):
-        """Audio capture and send loop"""
-        stream = None
+    def _audio_capture_callback(self, in_data, frame_count, time_info, status):
+        """PortAudio capture callback; forwards each chunk as it lands"""
+        if not self.audio_streaming:
+            return (None, pyaudio.paComplete)
         try:
-            stream = self.audio.open(
-                format=self.audio_format,
-                channels=self.audio_channels,
-                rate=self.audio_rate,
-                input=True,
-                frames_per_buffer=self.audio_chunk
-            )
-            
-            while self.audio_streaming:
-                try:
-                    data = stream.read(self.audio_chunk, exception_on_overflow=False)
-                    self.network.send_audio_packet(data)
-                except Exception as e:
-                    if self.audio_streaming:  # Only log if not intentionally stopped
-                        print(f"Audio send error: {e}")
-                    break
+            self._audio_batch.append(in_data)
+            if len(self._audio_batch) >= self.audio_max_batch:
+                # Playback just writes whatever sample count arrives, so a
+                # coalesced packet needs no receiver-side change
+                self.network.send_audio_packet(b''.join(self._audio_batch))
+                self._audio_batch = []
         except Exception as e:
-            print(f"Audio capture error: {e}")
-        finally:
-            if stream:
-                try:
-                    stream.stop_stream()
-                    stream.close()
-                except:
-                    pass
+            if self.audio_streaming:  # Only log if not intentionally stopped
+                print(f"Audio send error: {e}")
+        return (None, pyaudio.paContinue)
     
     def _audio_playback_loop(self):
         """Audio receive and playback loop"""
@@ -402,33 +537,61 @@ class MediaHandler:
         import platform
         if platform.system() == 'Windows':
             import mss
-            import base64
-            import uuid
             with mss.mss() as sct:
                 monitor = sct.monitors[1]
                 frame_idx = 0
+                interval = 0.25  # 4 FPS
+                next_deadline = time.monotonic() + interval
                 while self.presenting:
                     sct_img = sct.grab(monitor)
-                    img = np.array(sct_img)
-                    img = img[..., :3]  # BGRA to BGR
-                    # Resize to max 960x540 while keeping aspect ratio
+                    # Zero-copy wrap of the raw BGRA grab; dropping alpha
+                    # stays a view until one explicit copy below
+                    img = np.frombuffer(sct_img.raw, dtype=np.uint8).reshape(
+                        sct_img.height, sct_img.width, 4)[:, :, :3]
+                    # Resize to max 960x540 while keeping aspect ratio. A
+                    # power-of-two stride slice first is pure pointer
+                    # arithmetic and slashes the pixels cv2.resize has to read
+                    # on 4K monitors
                     h, w, _ = img.shape
                     max_w, max_h = 960, 540
+                    stride = 1
+                    while stride < 4 and w // (stride * 2) >= max_w and h // (stride * 2) >= max_h:
+                        stride *= 2
+                    if stride > 1:
+                        img = img[::stride, ::stride]
+                        h, w, _ = img.shape
+                    # The one explicit copy: materialize the decimated BGR
+                    # planes contiguously so resize/encode don't each do a
+                    # hidden full-frame copy of their own
+                    img = np.ascontiguousarray(img)
                     scale = min(max_w/w, max_h/h, 1.0)
                     if scale < 1.0:
-                        img = cv2.resize(img, (int(w*scale), int(h*scale)))
-                    # Use PNG for lossless, robust transfer
-                    _, buffer = cv2.imencode('.png', img)
-                    frame_data = base64.b64encode(buffer).decode('utf-8')
-                    print(f"[MSS] Screen: orig=({w},{h}), scaled={img.shape}, buffer={len(buffer)}, base64={len(frame_data)}")
-                    self.network.send_tcp_message({
+                        img = cv2.resize(img, (int(w*scale), int(h*scale)),
+                                         interpolation=cv2.INTER_AREA)
+                    # JPEG: 4 FPS screen share doesn't need lossless PNG, and
+                    # deflate was the loop's biggest CPU cost
+                    jpeg_data = _encode_jpeg(img, quality=70)
+                    if DEBUG:
+                        print(f"[MSS] Screen: scaled={img.shape}, jpeg={len(jpeg_data)}")
+                    # Raw bytes on the binary channel: no base64 inflation and
+                    # no full-buffer encode/decode pass on either side
+                    self.network.send_tcp_binary({
                         'type': 'screen_frame',
-                        'frame_data': frame_data,
-                        'frame_id': str(uuid.uuid4()),
-                    })
+                        'frame_id': frame_idx,  # monotonic, lets receivers drop stale frames
+                    }, jpeg_data)
                     frame_idx += 1
-                    self.callback.on_local_screen_frame(Image.fromarray(cv2.cvtColor(img, cv2.COLOR_BGR2RGB)))
-                    time.sleep(0.25)  # 4 FPS
+                    # Reversed-channel view instead of cvtColor: PIL reads the
+                    # strided array directly, skipping the separate OpenCV
+                    # conversion pass and its intermediate frame
+                    self.callback.on_local_screen_frame(Image.fromarray(img[:, :, ::-1], mode='RGB'))
+                    # Pace against a monotonic deadline so grab/encode time
+                    # doesn't stack on top of the sleep and drag FPS down
+                    next_deadline += interval
+                    delay = next_deadline - time.monotonic()
+                    if delay > 0:
+                        time.sleep(delay)
+                    else:
+                        next_deadline = time.monotonic()
             return
         # Original Linux/gi path below
         try:
@@ -467,16 +630,24 @@ class MediaHandler:
         
         # Step 3: Build GStreamer pipeline
         # Pipeline: pipewiresrc -> videoconvert -> videoscale -> jpegenc -> appsink
+        # Prefer the VAAPI JPEG encoder when the GPU exposes one: the encode
+        # runs on the fixed-function block instead of a CPU core, and the
+        # wire format (plain JPEG frames) is unchanged for receivers
+        if Gst.ElementFactory.find('vaapijpegenc'):
+            enc = 'vaapipostproc ! vaapijpegenc'
+            print("[PORTAL] Using VAAPI hardware JPEG encoder")
+        else:
+            enc = 'jpegenc quality=75'
         pipeline_str = (
             f'pipewiresrc path={pipewire_node_id} do-timestamp=true ! '
             'video/x-raw ! '
             'videoconvert ! '
             'videoscale ! '
             'video/x-raw,width=1280,height=720 ! '
-            'jpegenc quality=75 ! '
+            f'{enc} ! '
             'appsink name=sink emit-signals=true sync=false max-buffers=1 drop=true'
         )
-        
+
         print(f"[PORTAL] Creating GStreamer pipeline: {pipeline_str}")
         
         try:
@@ -505,23 +676,25 @@ class MediaHandler:
                         success, map_info = buffer.map(Gst.MapFlags.READ)
                         
                         if success:
-                            # Get JPEG data directly from buffer
-                            jpeg_data = bytes(map_info.data)
-                            buffer.unmap(map_info)
-                            
-                            # Encode to base64 and send via TCP (same as old ffmpeg method)
-                            import base64
-                            frame_data = base64.b64encode(jpeg_data).decode('utf-8')
-                            
-                            # Send via TCP message (for screen sharing)
-                            self.network.send_tcp_message({
-                                'type': 'screen_frame',
-                                'frame_data': frame_data
-                            })
-                            
+                            frame_size = len(map_info.data)
+                            try:
+                                # Hand the mapped JPEG straight to the network
+                                # layer: it materializes a copy only when the
+                                # data is a live view, so there is at most one
+                                # copy per frame instead of an unconditional
+                                # bytes() plus whatever the send path adds
+                                self.network.send_tcp_binary({
+                                    'type': 'screen_frame',
+                                    'frame_id': frame_count[0],  # monotonic, lets receivers drop stale frames
+                                }, map_info.data)
+                            finally:
+                                # Safe to unmap: the payload was queued (and
+                                # copied if needed) before send returned
+                                buffer.unmap(map_info)
+
                             frame_count[0] += 1
                             if frame_count[0] % 30 == 0:  # Log every 3 seconds at 10 FPS
-                                print(f"[PORTAL] Streaming: {frame_count[0]} frames sent ({len(jpeg_data)} bytes/frame)")
+                                print(f"[PORTAL] Streaming: {frame_count[0]} frames sent ({frame_size} bytes/frame)")
                     
                     return Gst.FlowReturn.OK
                     
@@ -559,8 +732,8 @@ class MediaHandler:
                     elif msg.type == Gst.MessageType.EOS:
                         print("[PORTAL] End of stream")
                         break
-                
-                time.sleep(0.01)
+                # timed_pop_filtered already blocks up to 100 ms; an extra
+                # sleep here would only delay reaction to bus messages
             
             print(f"[PORTAL] Stopping pipeline (sent {frame_count[0]} frames total)")
             
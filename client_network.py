@@ -8,6 +8,38 @@ import threading
 import json
 import struct
 import time
+import queue
+
+try:
+    import orjson  # C JSON codec, ~2-5x faster and returns bytes directly
+except ImportError:
+    orjson = None
+
+# Pre-parsed wire formats and a bound compact encoder: skips format-string
+# parsing / encoder setup on every packet
+_LEN = struct.Struct('<I')
+_QLEN = struct.Struct('<Q')
+# UDP media packets are tagged with the server-assigned 2-byte client id;
+# relayed video additionally carries (frame_id, fragment index, fragment
+# count) for the server's sub-MTU fragments
+_CID = struct.Struct('<H')
+_FRAG = struct.Struct('!IHH')
+_json_encode = json.JSONEncoder(separators=(',', ':')).encode
+
+
+def _dumps(obj):
+    """Serialize a message to utf-8 bytes"""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return _json_encode(obj).encode('utf-8')
+
+
+def _loads(data):
+    """Deserialize utf-8 message bytes"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data.decode('utf-8'))
+
 
 class ClientNetwork:
     def __init__(self, callback_handler):
@@ -16,15 +48,58 @@ class ClientNetwork:
         self.tcp_port = 5555
         self.video_port = 5556
         self.audio_port = 5557
-        
+
         self.username = None
         self.tcp_socket = None
         self.video_socket = None
         self.audio_socket = None
-        
+
         self.connected = False
         self.running = False
+
+        # Outbound TCP frames are queued and drained by a sender thread that
+        # batches them into a single sendmsg (writev) call, instead of one
+        # send() syscall per message
+        self.send_queue = queue.Queue()
+        self._send_lock = threading.Lock()
+
+        # UDP packet prefix (2-byte client id, assigned by the server in the
+        # welcome message) and destination tuples, built once so per-packet
+        # sends don't rebuild them; media sends are held until the id arrives
+        self._id_prefix = None
+        self._users_by_id = {}  # {client_id: username} for inbound packets
+        self._video_addr = None
+        self._audio_addr = None
+        self._use_sendmsg = hasattr(socket.socket, 'sendmsg')  # not on Windows
+
+        # Buffered TCP reader: one big recv refills the buffer, so parsing a
+        # frame's length, header and body doesn't cost one syscall each
+        self._rbuf = bytearray()
+        self._rpos = 0
+
+        # Reused UDP receive buffers; only the payload slice is copied out,
+        # instead of a fresh 65 KB allocation per packet
+        self._video_recv_buf = bytearray(65535)
+        self._audio_recv_buf = bytearray(65535)
     
+    @staticmethod
+    def _tune_udp_socket(sock):
+        """Grow the kernel buffers and mark the flow as expedited.
+
+        The ~200 KB defaults drop packets under video bursts; a few MB of
+        headroom absorbs them. TOS 0xB8 (EF) lets routers that honor it
+        prioritize the media flows. Best-effort: unsupported options are
+        simply skipped.
+        """
+        for level, opt, value in (
+                (socket.SOL_SOCKET, socket.SO_SNDBUF, 4 * 1024 * 1024),
+                (socket.SOL_SOCKET, socket.SO_RCVBUF, 4 * 1024 * 1024),
+                (socket.IPPROTO_IP, socket.IP_TOS, 0xB8)):
+            try:
+                sock.setsockopt(level, opt, value)
+            except OSError:
+                pass
+
     def connect(self, server_host, username):
         """Connect to server"""
         self.server_host = server_host
@@ -34,24 +109,42 @@ class ClientNetwork:
             # TCP connection
             self.tcp_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
             self.tcp_socket.connect((self.server_host, self.tcp_port))
-            
+            # Screen-share frames shouldn't sit behind Nagle waiting for an
+            # ACK; QUICKACK (Linux-only) keeps the reverse path prompt too
+            self.tcp_socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            if hasattr(socket, 'TCP_QUICKACK'):
+                try:
+                    self.tcp_socket.setsockopt(socket.IPPROTO_TCP,
+                                               socket.TCP_QUICKACK, 1)
+                except OSError:
+                    pass
+
             # UDP sockets
             self.video_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
             self.video_socket.bind(('', 0))
+            self._tune_udp_socket(self.video_socket)
+            # Receivers drain this socket nonblocking, one syscall per packet
+            # with no per-call settimeout
+            self.video_socket.setblocking(False)
             
             self.audio_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
             self.audio_socket.bind(('', 0))
+            self._tune_udp_socket(self.audio_socket)
+
+            self._video_addr = (self.server_host, self.video_port)
+            self._audio_addr = (self.server_host, self.audio_port)
             
+            # Start sender and receiver
+            self.running = True
+            threading.Thread(target=self._send_tcp_loop, daemon=True).start()
+            threading.Thread(target=self._receive_tcp_loop, daemon=True).start()
+
             # Register
             self.send_tcp_message({
                 'type': 'register',
                 'username': self.username
             })
-            
-            # Start receiver
-            self.running = True
-            threading.Thread(target=self._receive_tcp_loop, daemon=True).start()
-            
+
             # Register UDP addresses with actual client IP (not 0.0.0.0)
             # Get the local IP that's connected to the server
             local_ip = self.tcp_socket.getsockname()[0]
@@ -72,26 +165,151 @@ class ClientNetwork:
         except Exception as e:
             return False, str(e)
     
+    def set_client_id(self, client_id):
+        """Adopt the server-assigned id used to tag outbound UDP packets"""
+        self._id_prefix = _CID.pack(client_id)
+
+    def set_user_ids(self, mapping):
+        """Refresh the {username: client_id} roster from the server"""
+        self._users_by_id = {cid: name for name, cid in mapping.items()}
+
     def send_tcp_message(self, message):
-        """Send JSON message over TCP"""
+        """Queue a JSON message for sending over TCP"""
         try:
-            data = json.dumps(message).encode('utf-8')
-            length = struct.pack('I', len(data))
-            self.tcp_socket.sendall(length + data)
+            data = _dumps(message)
+            self.send_queue.put(_LEN.pack(len(data)) + data)
             return True
         except:
             return False
-    
+
+    def send_tcp_binary(self, header, payload):
+        """Queue a JSON header plus raw binary payload for sending over TCP.
+
+        A zero length prefix marks a binary frame:
+        0x00000000 | header_len(I) | header_json | payload_len(Q) | payload
+        Payload bytes go on the wire as-is (no base64).
+        """
+        try:
+            header_data = _dumps(header)
+            prefix = (_LEN.pack(0) +
+                      _LEN.pack(len(header_data)) +
+                      header_data +
+                      _QLEN.pack(len(payload)))
+            if not isinstance(payload, (bytes, bytearray)):
+                payload = bytes(payload)
+            self.send_queue.put((prefix, payload))
+            return True
+        except:
+            return False
+
+    def _send_tcp_loop(self):
+        """Drain the outbound queue and batch frames into one sendmsg call"""
+        while self.running:
+            try:
+                item = self.send_queue.get(timeout=0.001)
+            except queue.Empty:
+                continue
+
+            batch = [item]
+            while len(batch) < 100:
+                try:
+                    batch.append(self.send_queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            if not self._send_batch(batch):
+                break
+
+    def _send_batch(self, batch):
+        """Write a batch of queued frames with a single sendmsg (writev);
+        where sendmsg is missing (Windows) they are joined and sent with
+        one sendall instead"""
+        buffers = []
+        for item in batch:
+            if isinstance(item, tuple):
+                buffers.extend(item)
+            else:
+                buffers.append(item)
+
+        try:
+            with self._send_lock:
+                if not self._use_sendmsg:
+                    self.tcp_socket.sendall(b''.join(buffers))
+                    return True
+                while buffers:
+                    sent = self.tcp_socket.sendmsg(buffers)
+                    # Drop fully-sent buffers, trim a partially-sent one
+                    while sent > 0:
+                        if sent >= len(buffers[0]):
+                            sent -= len(buffers[0])
+                            buffers.pop(0)
+                        else:
+                            buffers[0] = memoryview(buffers[0])[sent:]
+                            sent = 0
+            return True
+        except:
+            return False
+
+    def _flush_send_queue(self):
+        """Send anything still queued before the socket closes"""
+        batch = []
+        while True:
+            try:
+                batch.append(self.send_queue.get_nowait())
+            except queue.Empty:
+                break
+        if batch:
+            self._send_batch(batch)
+
     def _recv_exact(self, sock, n):
-        """Receive exactly n bytes"""
-        data = b''
-        while len(data) < n:
-            packet = sock.recv(n - len(data))
-            if not packet:
+        """Return exactly n bytes from the buffered TCP stream, or None on EOF.
+
+        Small reads (length prefixes, headers) are served from the buffer; the
+        socket is only hit in 64 KiB refills, which batches several queued
+        frames into one kernel crossing.
+        """
+        buf = self._rbuf
+        while len(buf) - self._rpos < n:
+            chunk = sock.recv(65536)
+            if not chunk:
                 return None
-            data += packet
+            buf += chunk
+        start = self._rpos
+        self._rpos += n
+        data = bytes(buf[start:self._rpos])
+        if self._rpos == len(buf):
+            # Everything consumed; reset instead of growing forever
+            del buf[:]
+            self._rpos = 0
+        elif self._rpos > 1 << 20:
+            del buf[:self._rpos]
+            self._rpos = 0
         return data
     
+    def _recv_binary(self, sock):
+        """Receive the body of a binary frame; returns header dict with
+        the raw payload attached under 'payload'"""
+        header_len_data = self._recv_exact(sock, 4)
+        if not header_len_data:
+            return None
+        header_len = _LEN.unpack(header_len_data)[0]
+
+        header_data = self._recv_exact(sock, header_len)
+        if not header_data:
+            return None
+        msg = _loads(header_data)
+
+        payload_len_data = self._recv_exact(sock, 8)
+        if not payload_len_data:
+            return None
+        payload_len = _QLEN.unpack(payload_len_data)[0]
+
+        payload = self._recv_exact(sock, payload_len) if payload_len else b''
+        if payload is None:
+            return None
+        msg['payload'] = payload
+        return msg
+
     def _receive_tcp_loop(self):
         """Receive TCP messages loop"""
         while self.running:
@@ -101,12 +319,19 @@ class ClientNetwork:
                 if not length_data:
                     break
                 
-                length = struct.unpack('I', length_data)[0]
-                data = self._recv_exact(self.tcp_socket, length)
-                if not data:
-                    break
-                
-                msg = json.loads(data.decode('utf-8'))
+                length = _LEN.unpack(length_data)[0]
+
+                if length == 0:
+                    # Binary frame: JSON header followed by a raw payload
+                    msg = self._recv_binary(self.tcp_socket)
+                    if msg is None:
+                        break
+                else:
+                    data = self._recv_exact(self.tcp_socket, length)
+                    if not data:
+                        break
+                    msg = _loads(data)
+
                 self.callback.on_server_message(msg)
             except:
                 if self.running:
@@ -117,62 +342,93 @@ class ClientNetwork:
     
     def send_video_packet(self, frame_data):
         """Send video packet"""
+        prefix = self._id_prefix
+        if prefix is None:
+            return  # server hasn't assigned our id yet
         try:
-            username_bytes = self.username.encode('utf-8')
-            header = struct.pack('I', len(username_bytes))
-            packet = header + username_bytes + frame_data
-            self.video_socket.sendto(packet, (self.server_host, self.video_port))
+            if self._use_sendmsg:
+                # Scatter-gather: the kernel assembles prefix + payload, so the
+                # JPEG is never copied into a concatenated packet
+                self.video_socket.sendmsg((prefix, frame_data),
+                                          (), 0, self._video_addr)
+            else:
+                self.video_socket.sendto(prefix + frame_data, self._video_addr)
         except:
             pass
-    
+
     def send_audio_packet(self, audio_data):
         """Send audio packet"""
+        prefix = self._id_prefix
+        if prefix is None:
+            return
         try:
-            username_bytes = self.username.encode('utf-8')
-            header = struct.pack('I', len(username_bytes))
-            packet = header + username_bytes + audio_data
-            self.audio_socket.sendto(packet, (self.server_host, self.audio_port))
+            if self._use_sendmsg:
+                self.audio_socket.sendmsg((prefix, audio_data),
+                                          (), 0, self._audio_addr)
+            else:
+                self.audio_socket.sendto(prefix + audio_data, self._audio_addr)
         except:
             pass
     
+    def receive_video_packet_nonblocking(self):
+        """Receive one video fragment without blocking.
+
+        Returns (username, frame_id, index, count, chunk); username is None
+        when the socket is drained or the packet is malformed.
+        """
+        buf = self._video_recv_buf
+        try:
+            n = self.video_socket.recv_into(buf)
+        except (BlockingIOError, OSError):
+            return None, None, None, None, None
+
+        if n < 2 + _FRAG.size:
+            return None, None, None, None, None
+
+        # Map the sender's 2-byte id back to a username; unknown ids (roster
+        # update still in flight) are dropped
+        username = self._users_by_id.get(_CID.unpack_from(buf)[0])
+        if username is None:
+            return None, None, None, None, None
+        frame_id, index, count = _FRAG.unpack_from(buf, 2)
+        # Copy out just the chunk so it survives the next recv into buf
+        return username, frame_id, index, count, bytes(buf[2+_FRAG.size:n])
+
     def receive_video_packet(self, timeout=0.01):
-        """Receive video packet"""
+        """Receive one video fragment, blocking up to timeout"""
         try:
             self.video_socket.settimeout(timeout)
             data, _ = self.video_socket.recvfrom(65535)
-            
-            if len(data) < 4:
-                return None, None
-            
-            username_len = struct.unpack('I', data[:4])[0]
-            if len(data) < 4 + username_len:
-                return None, None
-            
-            username = data[4:4+username_len].decode('utf-8')
-            frame_data = data[4+username_len:]
-            
-            return username, frame_data
+
+            if len(data) < 2 + _FRAG.size:
+                return None, None, None, None, None
+
+            username = self._users_by_id.get(_CID.unpack_from(data)[0])
+            if username is None:
+                return None, None, None, None, None
+            frame_id, index, count = _FRAG.unpack_from(data, 2)
+
+            return username, frame_id, index, count, data[2+_FRAG.size:]
         except socket.timeout:
-            return None, None
+            return None, None, None, None, None
         except:
-            return None, None
+            return None, None, None, None, None
     
     def receive_audio_packet(self, timeout=0.01):
         """Receive audio packet"""
+        buf = self._audio_recv_buf
         try:
             self.audio_socket.settimeout(timeout)
-            data, _ = self.audio_socket.recvfrom(65535)
-            
-            if len(data) < 4:
+            n = self.audio_socket.recv_into(buf)
+
+            if n < 2:
                 return None, None
-            
-            username_len = struct.unpack('I', data[:4])[0]
-            if len(data) < 4 + username_len:
+
+            username = self._users_by_id.get(_CID.unpack_from(buf)[0])
+            if username is None:
                 return None, None
-            
-            username = data[4:4+username_len].decode('utf-8')
-            audio_data = data[4+username_len:]
-            
+            audio_data = bytes(buf[2:n])
+
             return username, audio_data
         except socket.timeout:
             return None, None
@@ -183,7 +439,9 @@ class ClientNetwork:
         """Disconnect from server"""
         self.running = False
         self.connected = False
-        
+
+        self._flush_send_queue()
+
         if self.tcp_socket:
             try:
                 self.tcp_socket.close()
@@ -10,7 +10,219 @@ import json
 import struct
 import time
 import os
-from datetime import datetime
+import tempfile
+import ctypes
+import ctypes.util
+import selectors
+import logging
+import logging.handlers
+import queue
+from collections import OrderedDict
+
+try:
+    import orjson  # C JSON codec, ~2-5x faster and returns bytes directly
+except ImportError:
+    orjson = None
+
+# Bound compact encoder: skips encoder setup (and the spaces) per message
+_json_encode = json.JSONEncoder(separators=(',', ':')).encode
+
+# Logging goes through a queue: the emitting thread does one lock-free
+# put and a background listener does the actual write(), so relay and
+# writer threads never block on the stdout lock. Per-message and
+# per-packet records are DEBUG and off by default; raise to DEBUG to
+# trace traffic.
+_log_queue = queue.SimpleQueue()
+logging.handlers.QueueListener(_log_queue, logging.StreamHandler(),
+                               respect_handler_level=True).start()
+log = logging.getLogger('server')
+log.addHandler(logging.handlers.QueueHandler(_log_queue))
+log.setLevel(logging.INFO)
+
+
+def _dumps(obj):
+    """Serialize a message to utf-8 bytes"""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return _json_encode(obj).encode('utf-8')
+
+
+def _loads(data):
+    """Deserialize utf-8 message bytes"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data.decode('utf-8'))
+
+
+# Message timestamps only carry second resolution, so strftime (locale
+# and format parsing every call) runs at most once per second per format;
+# everything else in that second reuses the cached string
+_ts_cache = [0, '']
+_ts_full_cache = [0, '']
+
+
+def _hms():
+    """Current HH:MM:SS, cached per second"""
+    t = int(time.time())
+    if t != _ts_cache[0]:
+        _ts_cache[0] = t
+        _ts_cache[1] = time.strftime('%H:%M:%S', time.localtime(t))
+    return _ts_cache[1]
+
+
+def _full_ts():
+    """Current YYYY-MM-DD HH:MM:SS, cached per second"""
+    t = int(time.time())
+    if t != _ts_full_cache[0]:
+        _ts_full_cache[0] = t
+        _ts_full_cache[1] = time.strftime('%Y-%m-%d %H:%M:%S',
+                                          time.localtime(t))
+    return _ts_full_cache[1]
+
+
+# UDP media packets are tagged with a fixed 2-byte client id instead of a
+# variable-length username, so the per-packet hot path is one unpack and a
+# list index rather than a UTF-8 decode and string compare
+_CID = struct.Struct('<H')
+
+# TCP framing prefixes. Explicit little-endian Structs: the format string
+# is parsed once at import, and '<' skips the native-alignment path that
+# plain 'I'/'Q' take on every pack/unpack. Wire layout is unchanged on
+# the x86/ARM little-endian hosts this runs on, but is now pinned rather
+# than inherited from the host
+_U32 = struct.Struct('<I')
+_U64 = struct.Struct('<Q')
+
+# Video frames are relayed as sub-MTU fragments so a lost 1500-byte IP
+# fragment doesn't discard a whole multi-KB JPEG: each fragment carries
+# (frame_id, fragment index, fragment count) after the username header
+_FRAG = struct.Struct('!IHH')
+MAX_UDP_PAYLOAD = 1400  # stays under a 1500 MTU after IP/UDP headers
+
+# Total bytes of uploaded files kept spooled on disk; past this, the
+# least recently downloaded files are deleted so the share list can't
+# grow without bound over a long session
+SHARED_FILES_CAP = 256 * 1024 * 1024
+
+# Per-client send backlog above which the writer holds droppable frames
+# (screen share) in their coalesce slot instead of appending them; a peer
+# this far behind won't catch up by being handed more video
+SEND_HWM = 4 * 1024 * 1024
+
+# sendmmsg(2) binding: fans one datagram out to every recipient in a single
+# syscall instead of one sendto per client. glibc-only; other platforms
+# fall back to the plain sendto loop.
+try:
+    _libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+    _libc.sendmmsg
+except (OSError, AttributeError, TypeError):
+    _libc = None
+
+_has_recvmmsg = _libc is not None and hasattr(_libc, 'recvmmsg')
+
+
+class _iovec(ctypes.Structure):
+    _fields_ = [('iov_base', ctypes.c_void_p),
+                ('iov_len', ctypes.c_size_t)]
+
+
+def _pack_sockaddr_in(host, port):
+    """struct sockaddr_in as raw bytes: family in host order, port and
+    address in network order"""
+    return (struct.pack('=H', socket.AF_INET) +
+            struct.pack('!H', port) +
+            socket.inet_aton(host) +
+            b'\x00' * 8)
+
+
+class _msghdr(ctypes.Structure):
+    _fields_ = [('msg_name', ctypes.c_void_p),
+                ('msg_namelen', ctypes.c_uint32),
+                ('msg_iov', ctypes.POINTER(_iovec)),
+                ('msg_iovlen', ctypes.c_size_t),
+                ('msg_control', ctypes.c_void_p),
+                ('msg_controllen', ctypes.c_size_t),
+                ('msg_flags', ctypes.c_int)]
+
+
+class _mmsghdr(ctypes.Structure):
+    _fields_ = [('msg_hdr', _msghdr),
+                ('msg_len', ctypes.c_uint)]
+
+
+# recvmmsg(2) flag: block for the first datagram, then return with
+# whatever else is already queued instead of waiting to fill the batch
+_MSG_WAITFORONE = 0x10000
+
+
+class _RecvBatch:
+    """Preallocated recvmmsg(2) state for one relay socket.
+
+    Buffers, iovecs and message headers are set up once; each recv() is
+    then a single syscall that drains up to `depth` queued datagrams, so
+    a busy relay pays one kernel crossing per burst instead of per packet.
+    """
+
+    def __init__(self, depth=32, bufsize=65535):
+        self.depth = depth
+        self._bufs = [ctypes.create_string_buffer(bufsize)
+                      for _ in range(depth)]
+        self._iovs = (_iovec * depth)()
+        self._msgs = (_mmsghdr * depth)()
+        for i in range(depth):
+            self._iovs[i].iov_base = ctypes.cast(self._bufs[i],
+                                                 ctypes.c_void_p)
+            self._iovs[i].iov_len = bufsize
+            hdr = self._msgs[i].msg_hdr
+            hdr.msg_iov = ctypes.pointer(self._iovs[i])
+            hdr.msg_iovlen = 1
+
+    def recv(self, sock):
+        """Return the list of datagrams taken in one recvmmsg call"""
+        r = _libc.recvmmsg(sock.fileno(), self._msgs, self.depth,
+                           _MSG_WAITFORONE, None)
+        if r <= 0:
+            return []
+        return [ctypes.string_at(self._bufs[i], self._msgs[i].msg_len)
+                for i in range(r)]
+
+
+def _sendmmsg(sock, data, addrs):
+    """Send one datagram to every address with a single sendmmsg syscall.
+
+    Returns False when the binding is unavailable so the caller can fall
+    back to a sendto loop. Datagrams the kernel refuses are dropped, like
+    any other lost UDP packet.
+    """
+    if _libc is None:
+        return False
+    n = len(addrs)
+    if n == 0:
+        return True
+
+    buf = ctypes.create_string_buffer(data, len(data))
+    iov = _iovec(ctypes.cast(buf, ctypes.c_void_p), len(data))
+    msgs = (_mmsghdr * n)()
+    names = []  # keeps the sockaddr buffers alive through the syscall
+    for i, (host, port) in enumerate(addrs):
+        sa = ctypes.create_string_buffer(_pack_sockaddr_in(host, port), 16)
+        names.append(sa)
+        hdr = msgs[i].msg_hdr
+        hdr.msg_name = ctypes.cast(sa, ctypes.c_void_p)
+        hdr.msg_namelen = 16
+        hdr.msg_iov = ctypes.pointer(iov)
+        hdr.msg_iovlen = 1
+
+    fd = sock.fileno()
+    sent = 0
+    while sent < n:
+        r = _libc.sendmmsg(fd, ctypes.byref(msgs, sent * ctypes.sizeof(_mmsghdr)),
+                           n - sent, 0)
+        if r <= 0:
+            break
+        sent += r
+    return True
+
 
 class LANCommServer:
     def __init__(self, host='0.0.0.0', tcp_port=5555, video_port=5556, audio_port=5557):
@@ -19,16 +231,35 @@ class LANCommServer:
         self.video_port = video_port
         self.audio_port = audio_port
         
-        # Client management
-        self.clients = {}  # {username: {tcp_socket, address, video_addr, audio_addr}}
-        self.clients_lock = threading.Lock()
+        # Client management. The dict is copy-on-write: membership changes
+        # build a new dict under clients_lock and rebind self.clients, so
+        # readers (broadcasts, the writer thread, relays) take a snapshot
+        # with one attribute load and iterate with no lock at all
+        self.clients = {}  # {username: {tcp_socket, address, video_addr, audio_addr, ...}}
+        self.clients_lock = threading.Lock()  # serializes mutations only
+        # Read-mostly snapshots, rebuilt under clients_lock on membership
+        # churn; hot paths read them with a single atomic attribute load
+        # instead of taking the lock and walking the dict per packet
+        self._client_names = []
+        self._video_targets = []  # [(username, video_addr)] with bound addrs
+        self._audio_targets = []  # [(username, audio_addr)] with bound addrs
+        self._client_ids = {}  # {username: client_id}, sent to clients
+        # client id allocation: small ints handed out at register time and
+        # recycled on disconnect; UDP packets carry the id, this maps back
+        self._clients_by_id = [None] * 65536
+        self._free_ids = []
+        self._next_client_id = 1  # 0 stays unassigned
         
         # Session management
         self.presenter = None
         self.presenter_lock = threading.Lock()
         
-        # File sharing
-        self.shared_files = {}  # {file_id: {filename, size, data}}
+        # File sharing; uploads stream in chunks and are spooled to temp
+        # files so the server never holds a whole upload in memory
+        # Insertion/recency ordered so the oldest untouched file is first
+        # in line for eviction once the spool passes SHARED_FILES_CAP
+        self.shared_files = OrderedDict()  # {file_id: {filename, size, path, uploader, timestamp}}
+        self.pending_uploads = {}  # {file_id: {file, filename, size, uploader, received}}
         self.files_lock = threading.Lock()
         
         # Sockets
@@ -38,9 +269,29 @@ class LANCommServer:
         
         # Running flag
         self.running = False
+
+        # Set whenever a send buffer gains data, so the writer thread wakes
+        # promptly instead of polling
+        self._send_wakeup = threading.Event()
+
+        # Message dispatch: one dict lookup instead of walking an elif
+        # chain per message (mirrors the handler table in the GUI client)
+        self._handlers = {
+            'chat': self._handle_chat,
+            'video_register': self._handle_video_register,
+            'audio_register': self._handle_audio_register,
+            'start_presentation': self._handle_start_presentation,
+            'stop_presentation': self._handle_stop_presentation,
+            'screen_frame': self._handle_screen_frame,
+            'private_chat': self._handle_private_chat,
+            'file_upload_begin': self._handle_file_upload_begin,
+            'file_chunk': self._handle_file_chunk,
+            'file_upload_end': self._handle_file_upload_end,
+            'file_download': self._handle_file_download,
+        }
         
-        print(f"[SERVER] Initializing LAN Communication Server")
-        print(f"[SERVER] TCP Port: {tcp_port}, Video Port: {video_port}, Audio Port: {audio_port}")
+        log.info("[SERVER] Initializing LAN Communication Server")
+        log.info(f"[SERVER] TCP Port: {tcp_port}, Video Port: {video_port}, Audio Port: {audio_port}")
     
     def start(self):
         """Start all server components"""
@@ -51,169 +302,266 @@ class LANCommServer:
         self.tcp_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
         self.tcp_socket.bind((self.host, self.tcp_port))
         self.tcp_socket.listen(10)
-        print(f"[TCP] Server listening on {self.host}:{self.tcp_port}")
+        log.info(f"[TCP] Server listening on {self.host}:{self.tcp_port}")
         
         # Start UDP server for video
         self.video_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
         self.video_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._tune_udp_socket(self.video_socket)
         self.video_socket.bind((self.host, self.video_port))
-        print(f"[VIDEO] UDP server listening on {self.host}:{self.video_port}")
+        # Outbound video is fragmented to sub-MTU sizes below, so refuse
+        # silent IP fragmentation rather than mask a sizing bug (Linux-only)
+        if hasattr(socket, 'IP_MTU_DISCOVER'):
+            try:
+                self.video_socket.setsockopt(socket.IPPROTO_IP,
+                                             socket.IP_MTU_DISCOVER,
+                                             socket.IP_PMTUDISC_DO)
+            except OSError:
+                pass
+        log.info(f"[VIDEO] UDP server listening on {self.host}:{self.video_port}")
         
         # Start UDP server for audio
         self.audio_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
         self.audio_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._tune_udp_socket(self.audio_socket)
         self.audio_socket.bind((self.host, self.audio_port))
-        print(f"[AUDIO] UDP server listening on {self.host}:{self.audio_port}")
+        log.info(f"[AUDIO] UDP server listening on {self.host}:{self.audio_port}")
         
         # Start handler threads
-        threading.Thread(target=self.accept_connections, daemon=True).start()
-        threading.Thread(target=self.handle_video_stream, daemon=True).start()
-        threading.Thread(target=self.handle_audio_stream, daemon=True).start()
-        
-        print("[SERVER] All services started successfully")
-    
-    def accept_connections(self):
-        """Accept incoming TCP connections"""
-        while self.running:
+        threading.Thread(target=self._reactor_loop, daemon=True).start()
+        threading.Thread(target=self._relay_udp,
+                         args=(self.video_socket, '_video_targets', 'VIDEO'),
+                         kwargs={'fragment': True}, daemon=True).start()
+        threading.Thread(target=self._relay_udp,
+                         args=(self.audio_socket, '_audio_targets', 'AUDIO'),
+                         daemon=True).start()
+        threading.Thread(target=self._writer_loop, daemon=True).start()
+
+        log.info("[SERVER] All services started successfully")
+
+    def _rebuild_snapshots(self):
+        """Refresh the lock-free read snapshots; call under clients_lock"""
+        self._client_names = list(self.clients.keys())
+        self._client_ids = {name: ci['client_id']
+                            for name, ci in self.clients.items()}
+        self._video_targets = [(name, ci['video_addr'])
+                               for name, ci in self.clients.items()
+                               if ci['video_addr']]
+        self._audio_targets = [(name, ci['audio_addr'])
+                               for name, ci in self.clients.items()
+                               if ci['audio_addr']]
+
+    @staticmethod
+    def _tune_udp_socket(sock):
+        """Give a media socket room to absorb bursts.
+
+        N clients at 30 fps can land well past the ~200 KB kernel default
+        between two scheduler slices of the relay thread; 4 MB keeps those
+        bursts queued instead of dropped. SO_REUSEPORT is set where
+        available so more relay threads can share the port later. Raising
+        past net.core.rmem_max needs a sysctl, hence best-effort.
+        """
+        for opt in (socket.SO_RCVBUF, socket.SO_SNDBUF):
             try:
-                client_socket, address = self.tcp_socket.accept()
-                print(f"[TCP] New connection from {address}")
-                threading.Thread(target=self.handle_client, args=(client_socket, address), daemon=True).start()
-            except Exception as e:
-                if self.running:
-                    print(f"[TCP] Error accepting connection: {e}")
-    
-    def handle_client(self, client_socket, address):
-        """Handle individual client TCP connection"""
-        username = None
-        try:
-            # Receive registration message
-            data = self.recv_message(client_socket)
-            if data and data['type'] == 'register':
-                username = data['username']
-                
-                with self.clients_lock:
-                    self.clients[username] = {
-                        'tcp_socket': client_socket,
-                        'address': address,
-                        'video_addr': None,
-                        'audio_addr': None
-                    }
-                
-                # Send welcome message
-                self.send_message(client_socket, {
-                    'type': 'welcome',
-                    'message': f'Welcome to LAN Communication Server, {username}!',
-                    'users': list(self.clients.keys())
-                })
-                # If someone is already presenting, inform the newly joined user
-                with self.presenter_lock:
-                    if self.presenter is not None:
-                        self.send_message(client_socket, {
-                            'type': 'presentation_started',
-                            'username': self.presenter
-                        })
-                
-                # Notify all other clients
-                self.broadcast_message({
-                    'type': 'user_joined',
-                    'username': username,
-                    'users': list(self.clients.keys())
-                }, exclude=username)
-                
-                print(f"[TCP] User '{username}' registered from {address}")
-                
-                # Handle client messages
-                while self.running:
-                    msg = self.recv_message(client_socket)
-                    if not msg:
-                        break
-                    
-                    self.process_message(username, msg)
-            
-        except Exception as e:
-            print(f"[TCP] Error handling client {username}: {e}")
-        finally:
-            # Cleanup
-            if username:
-                with self.clients_lock:
-                    if username in self.clients:
-                        del self.clients[username]
-                
-                # Check if presenter left
-                with self.presenter_lock:
-                    if self.presenter == username:
-                        self.presenter = None
-                        self.broadcast_message({
-                            'type': 'presentation_stopped',
-                            'username': username
-                        })
-                
-                # Notify others
-                self.broadcast_message({
-                    'type': 'user_left',
-                    'username': username,
-                    'users': list(self.clients.keys())
-                })
-                
-                print(f"[TCP] User '{username}' disconnected")
-            
+                sock.setsockopt(socket.SOL_SOCKET, opt, 4 * 1024 * 1024)
+            except OSError:
+                pass
+        if hasattr(socket, 'SO_REUSEPORT'):
             try:
-                client_socket.close()
-            except:
+                sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+            except OSError:
                 pass
-    
-    def process_message(self, username, msg):
-        """Process messages from clients"""
-        msg_type = msg.get('type')
-        
-        if msg_type == 'chat':
-            # Broadcast chat message
-            self.broadcast_message({
-                'type': 'chat',
-                'username': username,
-                'message': msg['message'],
-                'timestamp': datetime.now().strftime('%H:%M:%S')
-            })
-            print(f"[CHAT] {username}: {msg['message']}")
-        
-        elif msg_type == 'video_register':
-            # Register video address
-            with self.clients_lock:
-                if username in self.clients:
-                    self.clients[username]['video_addr'] = tuple(msg['address'])
-            print(f"[VIDEO] Registered video address for {username}")
-        
-        elif msg_type == 'audio_register':
-            # Register audio address
+
+    def _reactor_loop(self):
+        """Accept connections and read every client from one selector thread.
+
+        Replaces the thread-per-connection model: a single reactor owns all
+        client fds, does one nonblocking recv per readable socket and pulls
+        as many complete frames as the buffer holds, so the server doesn't
+        pay a GIL-contended OS thread per client.
+        """
+        sel = selectors.DefaultSelector()
+        sel.register(self.tcp_socket, selectors.EVENT_READ, None)
+        while self.running:
+            try:
+                events = sel.select(timeout=0.5)
+            except OSError:
+                break
+            for key, _ in events:
+                if key.data is None:
+                    # Listening socket is readable: accept a new connection
+                    try:
+                        client_socket, address = self.tcp_socket.accept()
+                    except OSError:
+                        continue
+                    log.info(f"[TCP] New connection from {address}")
+                    client_socket.setblocking(False)
+                    # Chat/control frames are tiny; don't let Nagle hold
+                    # them for a coalescing window. A bigger send buffer
+                    # gives screen-frame fan-out headroom per client
+                    client_socket.setsockopt(socket.IPPROTO_TCP,
+                                             socket.TCP_NODELAY, 1)
+                    try:
+                        client_socket.setsockopt(socket.SOL_SOCKET,
+                                                 socket.SO_SNDBUF, 1024 * 1024)
+                    except OSError:
+                        pass
+                    conn = {'sock': client_socket, 'address': address,
+                            'rbuf': bytearray(), 'username': None}
+                    sel.register(client_socket, selectors.EVENT_READ, conn)
+                    continue
+
+                conn = key.data
+                try:
+                    chunk = key.fileobj.recv(65536)
+                except (BlockingIOError, InterruptedError):
+                    continue
+                except OSError:
+                    chunk = b''
+                if not chunk:
+                    sel.unregister(key.fileobj)
+                    self._disconnect_client(conn)
+                    continue
+                conn['rbuf'] += chunk
+                try:
+                    self._drain_frames(conn)
+                except Exception as e:
+                    log.error(f"[TCP] Error handling client {conn['username']}: {e}")
+                    sel.unregister(key.fileobj)
+                    self._disconnect_client(conn)
+        sel.close()
+
+    def _drain_frames(self, conn):
+        """Parse and dispatch every complete frame in a connection's buffer.
+
+        Incremental: whatever trails the last complete frame stays buffered
+        until the next recv, so partial frames cost nothing to resume.
+        """
+        buf = conn['rbuf']
+        pos = 0
+        n = len(buf)
+        while True:
+            if n - pos < 4:
+                break
+            length = _U32.unpack_from(buf, pos)[0]
+            if length:
+                if n - pos < 4 + length:
+                    break
+                msg = _loads(bytes(buf[pos+4:pos+4+length]))
+                pos += 4 + length
+            else:
+                # Binary frame: 0 | header_len(I) | header | payload_len(Q) | payload
+                if n - pos < 8:
+                    break
+                header_len = _U32.unpack_from(buf, pos+4)[0]
+                if n - pos < 16 + header_len:
+                    break
+                payload_len = _U64.unpack_from(buf, pos+8+header_len)[0]
+                total = 16 + header_len + payload_len
+                if n - pos < total:
+                    break
+                msg = _loads(bytes(buf[pos+8:pos+8+header_len]))
+                msg['payload'] = bytes(buf[pos+16+header_len:pos+total])
+                pos += total
+            self._handle_frame(conn, msg)
+        if pos:
+            del buf[:pos]
+
+    def _handle_frame(self, conn, msg):
+        """Dispatch one decoded frame for a connection"""
+        if conn['username'] is not None:
+            self.process_message(conn['username'], msg)
+            return
+
+        # First frame must be the registration
+        if msg.get('type') != 'register':
+            return
+        username = msg['username']
+        conn['username'] = username
+
+        client = {
+            'tcp_socket': conn['sock'],
+            'address': conn['address'],
+            'video_addr': None,
+            'audio_addr': None,
+            # Outbound frames queue here and a writer thread drains
+            # them as the socket becomes writable
+            'sendbuf': bytearray(),
+            'sendlock': threading.Lock(),
+            # True while a sendfile transfer owns the socket; the writer
+            # leaves it alone until the stream finishes. streamlock
+            # serializes whole transfers so two downloads can't interleave
+            # frames on the one TCP stream
+            'streaming': False,
+            'streamlock': threading.Lock(),
+            # Latest-wins slot for droppable frames (screen share): a new
+            # frame replaces an undelivered one instead of queueing behind it
+            'coalesce': None
+        }
+        with self.clients_lock:
+            cid = self._free_ids.pop() if self._free_ids else self._next_client_id
+            if cid == self._next_client_id:
+                self._next_client_id += 1
+            client['client_id'] = cid
+            self._clients_by_id[cid] = username
+            new = dict(self.clients)
+            new[username] = client
+            self.clients = new  # atomic publish
+            self._rebuild_snapshots()
+
+        # Send welcome message
+        self.send_message(client, {
+            'type': 'welcome',
+            'message': f'Welcome to LAN Communication Server, {username}!',
+            'users': self._client_names,
+            'client_id': cid,
+            'client_ids': self._client_ids
+        })
+        # If someone is already presenting, inform the newly joined user
+        with self.presenter_lock:
+            if self.presenter is not None:
+                self.send_message(client, {
+                    'type': 'presentation_started',
+                    'username': self.presenter
+                })
+
+        # Notify all other clients
+        self.broadcast_message({
+            'type': 'user_joined',
+            'username': username,
+            'users': self._client_names,
+            'client_ids': self._client_ids
+        }, exclude=username)
+
+        log.info(f"[TCP] User '{username}' registered from {conn['address']}")
+
+    def _disconnect_client(self, conn):
+        """Clean up after a connection closes or errors out"""
+        username = conn['username']
+        if username:
             with self.clients_lock:
-                if username in self.clients:
-                    self.clients[username]['audio_addr'] = tuple(msg['address'])
-            print(f"[AUDIO] Registered audio address for {username}")
-        
-        elif msg_type == 'start_presentation':
-            # Start presentation
-            with self.presenter_lock:
-                if self.presenter is None:
-                    self.presenter = username
-                    self.broadcast_message({
-                        'type': 'presentation_started',
-                        'username': username
-                    })
-                    self.send_to_user(username, {
-                        'type': 'presentation_control',
-                        'status': 'started'
-                    })
-                    print(f"[SCREEN] {username} started presenting")
-                else:
-                    self.send_to_user(username, {
-                        'type': 'presentation_control',
-                        'status': 'denied',
-                        'message': f'{self.presenter} is currently presenting'
-                    })
-        
-        elif msg_type == 'stop_presentation':
-            # Stop presentation
+                new = dict(self.clients)
+                client = new.pop(username, None)
+                if client is not None:
+                    cid = client['client_id']
+                    self._clients_by_id[cid] = None
+                    self._free_ids.append(cid)
+                self.clients = new  # atomic publish
+                self._rebuild_snapshots()
+
+            # Discard any half-finished uploads from this client
+            with self.files_lock:
+                for file_id in list(self.pending_uploads.keys()):
+                    pending = self.pending_uploads[file_id]
+                    if pending['uploader'] == username:
+                        del self.pending_uploads[file_id]
+                        try:
+                            pending['file'].close()
+                            os.unlink(pending['file'].name)
+                        except OSError:
+                            pass
+
+            # Check if presenter left
             with self.presenter_lock:
                 if self.presenter == username:
                     self.presenter = None
@@ -221,218 +569,500 @@ class LANCommServer:
                         'type': 'presentation_stopped',
                         'username': username
                     })
-                    print(f"[SCREEN] {username} stopped presenting")
-        
-        elif msg_type == 'screen_frame':
-            # Forward screen frame to all clients (INCLUDING sender so they see their own screen)
-            with self.presenter_lock:
-                if self.presenter == username:
-                    self.broadcast_message({
-                        'type': 'screen_frame',
-                        'username': username,
-                        'frame_data': msg['frame_data']
-                    })  # No exclude - everyone including presenter sees it
-                    print(f"[SCREEN] Broadcasted frame from {username} to all clients")
-        
-        elif msg_type == 'private_chat':
-            # Route private chat to a specific recipient and echo back to sender
-            to_user = (msg.get('to') or '').strip()
-            text = msg.get('message', '')
-            if not to_user or to_user == username:
-                return
-            print(f"[PM] {username} -> {to_user}: {text}")
-            # Deliver to recipient if online
-            delivered = False
-            canonical_to = None
-            with self.clients_lock:
-                # Resolve case-insensitive username to the canonical key stored on server
-                for key in self.clients.keys():
-                    if key.lower() == to_user.lower():
-                        canonical_to = key
-                        break
-                delivered = canonical_to is not None
-            if delivered and canonical_to:
-                # Broadcast to all; clients will locally filter to show only if
-                # they are the sender or the intended recipient. This avoids
-                # edge cases with name normalization and ensures delivery.
+
+            # Notify others
+            self.broadcast_message({
+                'type': 'user_left',
+                'username': username,
+                'users': self._client_names,
+                'client_ids': self._client_ids
+            })
+
+            log.info(f"[TCP] User '{username}' disconnected")
+
+        try:
+            conn['sock'].close()
+        except:
+            pass
+    
+    def process_message(self, username, msg):
+        """Dispatch a client message to its handler"""
+        handler = self._handlers.get(msg.get('type'))
+        if handler:
+            handler(username, msg)
+
+    def _handle_chat(self, username, msg):
+        """Broadcast a chat message to the room"""
+        self.broadcast_message({
+            'type': 'chat',
+            'username': username,
+            'message': msg['message'],
+            'timestamp': _hms()
+        })
+        log.debug("[CHAT] %s: %s", username, msg['message'])
+
+    def _handle_video_register(self, username, msg):
+        """Record a client's video UDP address"""
+        with self.clients_lock:
+            if username in self.clients:
+                self.clients[username]['video_addr'] = tuple(msg['address'])
+                self._rebuild_snapshots()
+        log.debug("[VIDEO] Registered video address for %s", username)
+
+    def _handle_audio_register(self, username, msg):
+        """Record a client's audio UDP address"""
+        with self.clients_lock:
+            if username in self.clients:
+                self.clients[username]['audio_addr'] = tuple(msg['address'])
+                self._rebuild_snapshots()
+        log.debug("[AUDIO] Registered audio address for %s", username)
+
+    def _handle_start_presentation(self, username, msg):
+        """Grant or deny the single presenter slot"""
+        with self.presenter_lock:
+            if self.presenter is None:
+                self.presenter = username
                 self.broadcast_message({
-                    'type': 'private_chat',
-                    'from': username,
-                    'to': canonical_to,
-                    'message': text,
-                    'timestamp': datetime.now().strftime('%H:%M:%S')
+                    'type': 'presentation_started',
+                    'username': username
+                })
+                self.send_to_user(username, {
+                    'type': 'presentation_control',
+                    'status': 'started'
                 })
-                print(f"[PM] delivered to {canonical_to} (broadcast)")
+                log.info(f"[SCREEN] {username} started presenting")
             else:
-                # Inform sender that user is offline/not found
                 self.send_to_user(username, {
-                    'type': 'system',
-                    'message': f"User '{to_user}' is not online",
-                    'level': 'warning'
+                    'type': 'presentation_control',
+                    'status': 'denied',
+                    'message': f'{self.presenter} is currently presenting'
                 })
-                print(f"[PM] failed: {to_user} not online")
-            # Echo to sender for local log (still send directly, harmless with broadcast above)
-            self.send_to_user(username, {
+
+    def _handle_stop_presentation(self, username, msg):
+        """Release the presenter slot if the sender holds it"""
+        with self.presenter_lock:
+            if self.presenter == username:
+                self.presenter = None
+                self.broadcast_message({
+                    'type': 'presentation_stopped',
+                    'username': username
+                })
+                log.info(f"[SCREEN] {username} stopped presenting")
+
+    def _handle_screen_frame(self, username, msg):
+        """Forward a screen frame to all clients (INCLUDING sender so they
+        see their own screen)"""
+        with self.presenter_lock:
+            if self.presenter == username:
+                # No exclude - everyone including presenter sees it.
+                # Droppable: clients too far behind skip stale frames
+                self.broadcast_binary({
+                    'type': 'screen_frame',
+                    'username': username,
+                    'frame_id': msg.get('frame_id', 0)
+                }, msg['payload'], droppable=True)
+                log.debug("[SCREEN] Broadcasted frame from %s to all clients", username)
+
+    def _handle_private_chat(self, username, msg):
+        """Route private chat to a specific recipient and echo back to sender"""
+        to_user = (msg.get('to') or '').strip()
+        text = msg.get('message', '')
+        if not to_user or to_user == username:
+            return
+        log.debug("[PM] %s -> %s: %s", username, to_user, text)
+        # Deliver to recipient if online
+        canonical_to = None
+        # Resolve case-insensitive username to the canonical key stored
+        # on server; lock-free read of the copy-on-write dict
+        for key in self.clients.keys():
+            if key.lower() == to_user.lower():
+                canonical_to = key
+                break
+        if canonical_to:
+            # Broadcast to all; clients will locally filter to show only if
+            # they are the sender or the intended recipient. This avoids
+            # edge cases with name normalization and ensures delivery.
+            self.broadcast_message({
                 'type': 'private_chat',
                 'from': username,
-                'to': canonical_to or to_user,
+                'to': canonical_to,
                 'message': text,
-                'timestamp': datetime.now().strftime('%H:%M:%S')
+                'timestamp': _hms()
             })
-        
-        elif msg_type == 'file_upload':
-            # Handle file upload
-            file_id = msg['file_id']
-            with self.files_lock:
+            log.debug("[PM] delivered to %s (broadcast)", canonical_to)
+        else:
+            # Inform sender that user is offline/not found
+            self.send_to_user(username, {
+                'type': 'system',
+                'message': f"User '{to_user}' is not online",
+                'level': 'warning'
+            })
+            log.debug("[PM] failed: %s not online", to_user)
+        # Echo to sender for local log (still send directly, harmless with broadcast above)
+        self.send_to_user(username, {
+            'type': 'private_chat',
+            'from': username,
+            'to': canonical_to or to_user,
+            'message': text,
+            'timestamp': _hms()
+        })
+
+    def _handle_file_upload_begin(self, username, msg):
+        """Open a spool file for the incoming chunk stream"""
+        file_id = msg['file_id']
+        spool = tempfile.NamedTemporaryFile(prefix='lancomm_', delete=False)
+        with self.files_lock:
+            self.pending_uploads[file_id] = {
+                'file': spool,
+                'filename': msg['filename'],
+                'size': msg['size'],
+                'uploader': username,
+                'received': 0
+            }
+        log.info(f"[FILE] {username} started uploading {msg['filename']} ({msg['size']} bytes)")
+
+    def _handle_file_chunk(self, username, msg):
+        """Append a raw chunk to the spool file"""
+        with self.files_lock:
+            pending = self.pending_uploads.get(msg['file_id'])
+            if pending and pending['uploader'] == username:
+                pending['file'].write(msg['payload'])
+                pending['received'] += len(msg['payload'])
+
+    def _handle_file_upload_end(self, username, msg):
+        """Finalize the upload and announce the file"""
+        file_id = msg['file_id']
+        with self.files_lock:
+            pending = self.pending_uploads.pop(file_id, None)
+            if pending is None or pending['uploader'] != username:
+                pending = None
+            else:
+                pending['file'].close()
+                # Finalize with the byte count actually spooled, not the
+                # size the uploader claimed: the download header and
+                # sendfile count come from this field, and a short spool
+                # behind an honest-looking size would leave the downloader
+                # blocked waiting for bytes that never come
+                if pending['received'] != pending['size']:
+                    log.error(f"[FILE] {pending['filename']}: announced {pending['size']} bytes but spooled {pending['received']}")
                 self.shared_files[file_id] = {
-                    'filename': msg['filename'],
-                    'size': msg['size'],
-                    'data': msg['data'],
+                    'filename': pending['filename'],
+                    'size': pending['received'],
+                    'path': pending['file'].name,
                     'uploader': username,
-                    'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+                    'timestamp': _full_ts()
                 }
-            
+                self._evict_shared_files()
+
+        if pending:
             # Notify all clients
             self.broadcast_message({
                 'type': 'file_available',
                 'file_id': file_id,
-                'filename': msg['filename'],
-                'size': msg['size'],
+                'filename': pending['filename'],
+                'size': pending['received'],
                 'uploader': username
             })
-            print(f"[FILE] {username} uploaded {msg['filename']} ({msg['size']} bytes)")
-        
-        elif msg_type == 'file_download':
-            # Handle file download request
-            file_id = msg['file_id']
-            with self.files_lock:
-                if file_id in self.shared_files:
-                    file_info = self.shared_files[file_id]
-                    self.send_to_user(username, {
-                        'type': 'file_data',
-                        'file_id': file_id,
-                        'filename': file_info['filename'],
-                        'size': file_info['size'],
-                        'data': file_info['data']
-                    })
-                    print(f"[FILE] Sent {file_info['filename']} to {username}")
-    
-    def handle_video_stream(self):
-        """Handle incoming video UDP packets and broadcast to all clients"""
-        while self.running:
+            log.info(f"[FILE] {username} uploaded {pending['filename']} ({pending['received']} bytes)")
+
+    def _evict_shared_files(self):
+        """Drop least recently used files while the spool is over cap.
+
+        Call under files_lock. The newest file always stays, even if it is
+        larger than the cap on its own.
+        """
+        total = sum(f['size'] for f in self.shared_files.values())
+        while total > SHARED_FILES_CAP and len(self.shared_files) > 1:
+            file_id, evicted = self.shared_files.popitem(last=False)
+            total -= evicted['size']
             try:
-                data, addr = self.video_socket.recvfrom(65535)
-                
-                # Parse username from packet header
-                if len(data) < 4:
-                    continue
-                
-                username_len = struct.unpack('I', data[:4])[0]
-                if len(data) < 4 + username_len:
-                    continue
-                
-                username = data[4:4+username_len].decode('utf-8')
-                frame_data = data[4+username_len:]
-                
-                # Broadcast to all other clients
-                with self.clients_lock:
-                    for client_name, client_info in self.clients.items():
-                        if client_name != username and client_info['video_addr']:
-                            try:
-                                self.video_socket.sendto(data, client_info['video_addr'])
-                            except Exception as e:
-                                print(f"[VIDEO] Error sending to {client_name}: {e}")
-            
-            except Exception as e:
-                if self.running:
-                    print(f"[VIDEO] Error: {e}")
-    
-    def handle_audio_stream(self):
-        """Handle incoming audio UDP packets and broadcast to all clients"""
+                os.unlink(evicted['path'])
+            except OSError:
+                pass
+            log.info(f"[FILE] Evicted {evicted['filename']} ({evicted['size']} bytes) to stay under spool cap")
+
+    def _handle_file_download(self, username, msg):
+        """Stream a shared file back to the requester (raw binary frame)"""
+        file_id = msg['file_id']
+        with self.files_lock:
+            file_info = self.shared_files.get(file_id)
+            if file_info:
+                # Recency touch: downloads push a file to the back of the
+                # eviction queue
+                self.shared_files.move_to_end(file_id)
+        if file_info:
+            client_info = self.clients.get(username)
+            if client_info:
+                header = {
+                    'type': 'file_data',
+                    'file_id': file_id,
+                    'filename': file_info['filename'],
+                    'size': file_info['size']
+                }
+                if file_info['size']:
+                    # Stream from disk with sendfile(2) on a dedicated
+                    # thread so the reactor isn't tied up for the
+                    # transfer; the wire format is unchanged
+                    threading.Thread(
+                        target=self._stream_file,
+                        args=(username, client_info, header, file_info),
+                        daemon=True).start()
+                else:
+                    self.send_binary(client_info, header, b'')
+        else:
+            # Unknown or evicted file id
+            self.send_to_user(username, {
+                'type': 'system',
+                'message': 'That file is no longer available',
+                'level': 'warning'
+            })
+
+    def _recv_datagrams(self, sock, batch):
+        """Pull the next burst of datagrams off a relay socket.
+
+        With the recvmmsg binding a whole queued burst arrives in one
+        syscall; otherwise one recvfrom at a time, as before.
+        """
+        if batch is not None:
+            return batch.recv(sock)
+        return [sock.recvfrom(65535)[0]]
+
+    def _relay_udp(self, sock, targets_attr, tag, fragment=False):
+        """Relay loop shared by the video and audio sockets.
+
+        The per-packet path — batched receive, 2-byte sender id resolve,
+        lock-free targets snapshot, sendmmsg fan-out — is written once, so
+        both media streams get every optimization and there is one hot
+        loop to keep warm instead of two near-identical ones. Video
+        additionally re-emits each frame as sub-MTU fragments; audio
+        packets are already small and pass through as-is.
+        """
+        frame_id = 0
+        batch = _RecvBatch() if _has_recvmmsg else None
         while self.running:
             try:
-                data, addr = self.audio_socket.recvfrom(65535)
-                
-                # Parse username from packet header
-                if len(data) < 4:
-                    continue
-                
-                username_len = struct.unpack('I', data[:4])[0]
-                if len(data) < 4 + username_len:
-                    continue
-                
-                username = data[4:4+username_len].decode('utf-8')
-                audio_data = data[4+username_len:]
-                
-                # Broadcast to all other clients
-                with self.clients_lock:
-                    for client_name, client_info in self.clients.items():
-                        if client_name != username and client_info['audio_addr']:
-                            try:
-                                self.audio_socket.sendto(data, client_info['audio_addr'])
-                            except Exception as e:
-                                print(f"[AUDIO] Error sending to {client_name}: {e}")
-            
+                for data in self._recv_datagrams(sock, batch):
+                    # Resolve the 2-byte sender id; unknown ids (stale or
+                    # pre-registration) are dropped
+                    if len(data) < 2:
+                        continue
+
+                    username = self._clients_by_id[_CID.unpack_from(data)[0]]
+                    if username is None:
+                        continue
+
+                    if fragment:
+                        # A JPEG split into 1400-byte pieces loses only
+                        # the pieces the network drops, instead of the
+                        # whole frame whenever one IP fragment dies
+                        frame_data = data[2:]
+                        prefix = data[:2]
+                        count = max(1, (len(frame_data) + MAX_UDP_PAYLOAD - 1)
+                                    // MAX_UDP_PAYLOAD)
+                        packets = [prefix +
+                                   _FRAG.pack(frame_id, i, count) +
+                                   frame_data[i*MAX_UDP_PAYLOAD:
+                                              (i+1)*MAX_UDP_PAYLOAD]
+                                   for i in range(count)]
+                        frame_id = (frame_id + 1) & 0xFFFFFFFF
+                    else:
+                        packets = (data,)
+
+                    # Lock-free: the target snapshot is rebuilt on
+                    # membership churn and read here with one atomic
+                    # attribute load; each packet then fans out with one
+                    # sendmmsg (sendto loop where the binding is
+                    # unavailable)
+                    addrs = [addr for name, addr in getattr(self, targets_attr)
+                             if name != username]
+                    for packet in packets:
+                        if not _sendmmsg(sock, packet, addrs):
+                            for addr in addrs:
+                                try:
+                                    sock.sendto(packet, addr)
+                                except Exception as e:
+                                    log.debug("[%s] Error sending to %s: %s", tag, addr, e)
+
             except Exception as e:
                 if self.running:
-                    print(f"[AUDIO] Error: {e}")
-    
-    def send_message(self, sock, message):
+                    log.error(f"[{tag}] Error: {e}")
+
+    def _encode_frame(self, message):
+        """Serialize a message into a ready-to-send length-prefixed frame"""
+        data = _dumps(message)
+        return _U32.pack(len(data)) + data
+
+    def _encode_binary_prefix(self, header, payload_len):
+        """Build everything before the payload of a binary frame.
+
+        A zero length prefix marks a binary frame:
+        0x00000000 | header_len(I) | header_json | payload_len(Q) | payload
+        File bytes travel as-is instead of inflating 33% through base64.
+        """
+        header_data = _dumps(header)
+        return (_U32.pack(0) +
+                _U32.pack(len(header_data)) +
+                header_data +
+                _U64.pack(payload_len))
+
+    def _enqueue(self, client, data, droppable=False):
+        """Append an encoded frame to one client's send buffer.
+
+        The writer thread drains buffers as sockets become writable, so a
+        backpressured client delays only itself. Droppable frames (screen
+        share) go into a single latest-wins slot instead: if the previous
+        frame hasn't been sent yet the new one replaces it, so a slow
+        client's backlog holds at most one stale frame and it resumes on
+        the current frame, not a replay of everything it missed.
+        """
+        with client['sendlock']:
+            if droppable:
+                client['coalesce'] = data
+            else:
+                client['sendbuf'] += data
+        self._send_wakeup.set()
+        return True
+
+    def send_message(self, client, message):
         """Send JSON message over TCP with length prefix"""
-        try:
-            data = json.dumps(message).encode('utf-8')
-            length = struct.pack('I', len(data))
-            sock.sendall(length + data)
-            return True
-        except Exception as e:
-            print(f"[TCP] Error sending message: {e}")
-            return False
-    
-    def recv_message(self, sock):
-        """Receive JSON message over TCP with length prefix"""
-        try:
-            # Receive length
-            length_data = self.recv_exact(sock, 4)
-            if not length_data:
-                return None
-            
-            length = struct.unpack('I', length_data)[0]
-            
-            # Receive message
-            data = self.recv_exact(sock, length)
-            if not data:
-                return None
-            
-            return json.loads(data.decode('utf-8'))
-        except Exception as e:
-            return None
-    
-    def recv_exact(self, sock, n):
-        """Receive exactly n bytes from socket"""
-        data = b''
-        while len(data) < n:
-            packet = sock.recv(n - len(data))
-            if not packet:
-                return None
-            data += packet
-        return data
-    
+        return self._enqueue(client, self._encode_frame(message))
+
+    def send_binary(self, client, header, payload, droppable=False):
+        """Send a JSON header plus raw binary payload over TCP"""
+        return self._enqueue(client,
+                             self._encode_binary_prefix(header, len(payload)) +
+                             bytes(payload), droppable)
+
+    def _stream_file(self, username, client, header, file_info):
+        """Send a shared file with sendfile(2): the kernel moves file pages
+        straight to the socket, no userspace copy of the file bytes.
+
+        Takes the socket over from the writer thread for the duration:
+        queued frames are flushed first so framing order holds, the socket
+        goes blocking for sendfile, and the writer resumes afterwards.
+        streamlock is held across the whole header+file write, so a second
+        download for the same client waits instead of interleaving its
+        frame into this one's payload.
+        """
+        sock = client['tcp_socket']
+        with client['streamlock']:
+            client['streaming'] = True
+            try:
+                # Holding sendlock here means any in-flight writer send has
+                # finished, and the flag keeps it away from now on
+                with client['sendlock']:
+                    sock.setblocking(True)
+                    buf = client['sendbuf']
+                    if buf:
+                        sock.sendall(buf)
+                        del buf[:]
+
+                size = file_info['size']
+                sock.sendall(self._encode_binary_prefix(header, size))
+                with open(file_info['path'], 'rb') as f:
+                    sock.sendfile(f, 0, size)
+                log.info(f"[FILE] Sent {file_info['filename']} to {username}")
+            except OSError as e:
+                log.error(f"[FILE] Error streaming {file_info['path']}: {e}")
+            finally:
+                try:
+                    sock.setblocking(False)
+                except OSError:
+                    pass
+                client['streaming'] = False
+                self._send_wakeup.set()
+
+    def _writer_loop(self):
+        """Drain per-client send buffers as their sockets become writable.
+
+        Each pass registers only sockets with pending data and writes one
+        send() per writable socket, so a stalled client's buffer just sits
+        there while everyone else's data keeps flowing.
+        """
+        sel = selectors.DefaultSelector()
+        while self.running:
+            # Copy-on-write dict: safe to scan without the mutation lock.
+            # Clients mid-sendfile are skipped until the stream finishes
+            pending = [ci for ci in self.clients.values()
+                       if (ci['sendbuf'] or ci['coalesce'] is not None)
+                       and not ci['streaming']]
+
+            if not pending:
+                self._send_wakeup.wait(timeout=0.05)
+                self._send_wakeup.clear()
+                continue
+
+            for client in pending:
+                try:
+                    sel.register(client['tcp_socket'], selectors.EVENT_WRITE,
+                                 client)
+                except (ValueError, KeyError, OSError):
+                    pass
+
+            try:
+                for key, _ in sel.select(timeout=0.05):
+                    client = key.data
+                    with client['sendlock']:
+                        if client['streaming']:
+                            continue  # a sendfile owns the socket right now
+                        buf = client['sendbuf']
+                        # Take-and-clear the coalesce slot once the ordered
+                        # backlog is under the HWM; frames replaced while
+                        # waiting here were never worth sending
+                        if (client['coalesce'] is not None
+                                and len(buf) < SEND_HWM):
+                            buf += client['coalesce']
+                            client['coalesce'] = None
+                        try:
+                            # Writability was just reported, so one send()
+                            # takes what the socket will accept without
+                            # blocking on a slow peer
+                            sent = key.fileobj.send(memoryview(buf))
+                            del buf[:sent]
+                        except (BlockingIOError, InterruptedError):
+                            pass
+                        except OSError:
+                            # Dead socket; the client's reader thread will
+                            # clean up, just stop buffering for it
+                            del buf[:]
+            finally:
+                for key in list(sel.get_map().values()):
+                    sel.unregister(key.fileobj)
+        sel.close()
+
     def broadcast_message(self, message, exclude=None):
-        """Broadcast message to all clients except excluded one"""
-        with self.clients_lock:
-            for username, client_info in self.clients.items():
-                if username != exclude:
-                    self.send_message(client_info['tcp_socket'], message)
-    
+        """Broadcast message to all clients except excluded one.
+
+        The frame is encoded once and the same buffer is written to every
+        recipient, instead of re-serializing the dict per client.
+        """
+        frame = self._encode_frame(message)
+        # Lock-free: self.clients is copy-on-write, so the snapshot can't
+        # change underneath the iteration
+        for username, client_info in self.clients.items():
+            if username != exclude:
+                self._enqueue(client_info, frame)
+
+    def broadcast_binary(self, header, payload, exclude=None, droppable=False):
+        """Broadcast a binary frame to all clients except excluded one.
+
+        Header and length prefixes are built once; only the per-client
+        buffer append repeats per recipient.
+        """
+        frame = self._encode_binary_prefix(header, len(payload)) + bytes(payload)
+        for username, client_info in self.clients.items():
+            if username != exclude:
+                self._enqueue(client_info, frame, droppable)
+
     def send_to_user(self, username, message):
         """Send message to specific user"""
-        with self.clients_lock:
-            if username in self.clients:
-                self.send_message(self.clients[username]['tcp_socket'], message)
+        client = self.clients.get(username)
+        if client:
+            self.send_message(client, message)
     
     def stop(self):
         """Stop the server"""
-        print("[SERVER] Shutting down...")
+        log.info("[SERVER] Shutting down...")
         self.running = False
         
         # Close all sockets
@@ -443,7 +1073,7 @@ class LANCommServer:
         if self.audio_socket:
             self.audio_socket.close()
         
-        print("[SERVER] Shutdown complete")
+        log.info("[SERVER] Shutdown complete")
 
 def main():
     server = LANCommServer()